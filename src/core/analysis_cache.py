@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import os
+from pathlib import Path
+import logging
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = "analysis_cache.json"
+
+# Bump when the record format changes so older caches are rebuilt
+CACHE_VERSION = 3
+
+
+def default_cache_dir() -> Path:
+    return Path.home() / ".pdf_rescue_squad"
+
+
+def _stat_key(path: Path) -> Optional[List[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def library_key(chat_db_path: Path, attachment_roots: Iterable[Path]) -> Dict[str, Any]:
+    """Describe the state of the Messages library without reading it.
+
+    Covers chat.db and its WAL, where new messages land first, and the
+    attachment roots. Any change means the cached analysis needs checking.
+    """
+    chat_db_path = Path(chat_db_path)
+    return {
+        "chat_db": _stat_key(chat_db_path),
+        "wal": _stat_key(chat_db_path.with_name(chat_db_path.name + "-wal")),
+        "roots": {str(root): _stat_key(root) for root in attachment_roots}
+    }
+
+
+class AnalysisCache:
+    """Analysis results from the previous run, stored in the app's home folder.
+
+    The records are saved with the library key they were built under. When
+    the key still matches they are used as they are; otherwise the caller
+    only queries attachments newer than ``max_id`` and re-checks files.
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.path = Path(cache_dir or default_cache_dir()) / CACHE_FILENAME
+        self.key: Optional[Dict[str, Any]] = None
+        self.records: Optional[List[Dict[str, Any]]] = None
+        self.max_id = 0
+
+    @classmethod
+    def load(cls, cache_dir: Optional[Path] = None) -> "AnalysisCache":
+        """Load the saved analysis, if there is a usable one."""
+        cache = cls(cache_dir)
+        try:
+            with open(cache.path) as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_VERSION:
+                return cache
+            cache.key = data["key"]
+            cache.records = data["records"]
+            cache.max_id = int(data["max_id"])
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable analysis cache {cache.path}: {e}")
+            cache = cls(cache_dir)
+        return cache
+
+    def save(self, key: Dict[str, Any], records: List[Dict[str, Any]]):
+        """Write the analysis atomically, replacing the previous one."""
+        self.key = key
+        self.records = records
+        self.max_id = max((pdf['id'] for pdf in records), default=0)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "version": CACHE_VERSION,
+                "key": key,
+                "max_id": self.max_id,
+                "records": records
+            }, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+import os
+import io
+import json
+import time
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+import logging
+from typing import Any, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ('.zip', '.tar')
+
+MANIFEST_NAME = "manifest.json"
+
+# Writes reach the archive in large sequential blocks
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# ZIP can't represent dates before 1980
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def archive_format(path) -> str:
+    """Get the archive type from a file name; raises ValueError if unsupported."""
+    suffix = Path(path).suffix.lower()
+    if suffix not in ARCHIVE_FORMATS:
+        raise ValueError(f"Unsupported archive type '{suffix}', use one of: {', '.join(ARCHIVE_FORMATS)}")
+    return suffix
+
+
+class _SequentialFile:
+    """Write-only view of a file.
+
+    zipfile seeks back to fill in each entry's header when it can; without
+    seek and tell it writes data descriptors after the entries instead.
+    """
+
+    def __init__(self, file):
+        self._file = file
+
+    def write(self, data) -> int:
+        return self._file.write(data)
+
+    def flush(self):
+        self._file.flush()
+
+
+class ArchiveWriter:
+    """A ZIP or tar archive that extracted PDFs are streamed into.
+
+    The archive is written front to back by one thread, so a network share
+    sees a single sequential write instead of a file creation per PDF. ZIP
+    entries are stored rather than deflated since PDFs are compressed
+    already. The file is written as ``<name>.partial`` and only renamed
+    once the manifest has been added.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.format = archive_format(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(self.path.name + ".partial")
+        self._file = open(self._tmp_path, 'wb', buffering=WRITE_BUFFER_SIZE)
+        if self.format == '.zip':
+            self._zip = zipfile.ZipFile(_SequentialFile(self._file), 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            self._tar = tarfile.open(fileobj=self._file, mode='w', format=tarfile.PAX_FORMAT)
+        self._names = set()
+        # Key of each archived file -> its entry name, to resolve duplicates
+        self._by_key: Dict[Hashable, str] = {}
+        self.files: List[Dict[str, Any]] = []
+        self.duplicates: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+
+    def _unique_name(self, name: str) -> str:
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        while name in self._names:
+            counter += 1
+            name = f"{stem}_{counter}{ext}"
+        self._names.add(name)
+        return name
+
+    def _write_entry(self, name: str, source, size: int, mtime: float):
+        if self.format == '.zip':
+            info = zipfile.ZipInfo(name, date_time=max(ZIP_EPOCH, time.localtime(mtime)[:6]))
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            info.external_attr = 0o644 << 16
+            with self._zip.open(info, 'w', force_zip64=size > 0x7fffffff) as dst:
+                shutil.copyfileobj(source, dst, WRITE_BUFFER_SIZE)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            self._tar.addfile(info, source)
+
+    def add_file(self, source_path: Path, name: str, mtime: Optional[float] = None,
+                 key: Optional[Hashable] = None, **details) -> str:
+        """Append a file; returns the entry name, made unique if needed.
+
+        ``details`` are recorded for the file in the manifest.
+        """
+        name = self._unique_name(name)
+        with open(source_path, 'rb') as source:
+            st = os.fstat(source.fileno())
+            self._write_entry(name, source, st.st_size, st.st_mtime if mtime is None else mtime)
+        self.bytes_written += st.st_size
+        if key is not None:
+            self._by_key[key] = name
+        self.files.append({"name": name, "size": st.st_size, **details})
+        return name
+
+    def add_duplicate(self, original_key: Hashable, **details):
+        """Note a PDF left out because the same content is archived under ``original_key``."""
+        self.duplicates.append({"original": original_key, **details})
+
+    def add_bytes(self, name: str, data: bytes) -> str:
+        name = self._unique_name(name)
+        self._write_entry(name, io.BytesIO(data), len(data), time.time())
+        return name
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        """Add the manifest and move the finished archive into place."""
+        duplicates = [
+            {**entry, "original": self._by_key.get(entry["original"], entry["original"])}
+            for entry in self.duplicates
+        ]
+        manifest = {**(summary or {}), "files": self.files, "duplicates": duplicates}
+        self.add_bytes(MANIFEST_NAME, json.dumps(manifest, indent=2, default=str).encode())
+        if self.format == '.zip':
+            self._zip.close()
+        else:
+            self._tar.close()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        logger.info(f"Wrote {len(self.files)} PDFs to {self.path}")
+
+    def abort(self):
+        """Discard an archive that can't be finished."""
+        try:
+            if self.format == '.zip':
+                self._zip.close()
+            else:
+                self._tar.close()
+        except Exception:
+            pass
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except OSError:
+            pass
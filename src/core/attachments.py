@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import os
+import stat
+import threading
+from pathlib import Path
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# How chat.db records attachment paths
+MESSAGES_PREFIX = "~/Library/Messages/"
+
+
+def default_attachment_roots(library_root: Optional[Path] = None) -> List[Path]:
+    """Get the possible locations of the Messages attachment tree."""
+    if library_root:
+        return [Path(library_root) / "Attachments"]
+    home = Path.home()
+    return [
+        home / "Library/Messages/Attachments",
+        home / "Library/Containers/com.apple.iChat/Data/Library/Messages/Attachments"
+    ]
+
+
+class AttachmentIndex:
+    """In-memory index of the Messages attachment tree.
+
+    The tree is walked once, on the first lookup, and every PDF is recorded
+    under its directory name, the attachment GUID. File names and stems are
+    not indexed: they repeat across attachments, so they can't identify one.
+    Lookups after that are plain dictionary hits.
+    """
+
+    def __init__(self, base_paths: Optional[Iterable[Path]] = None, library_root: Optional[Path] = None):
+        self.base_paths = [Path(p) for p in (base_paths or default_attachment_roots(library_root))]
+        # A Messages folder outside ~/Library; recorded paths are rebased onto it
+        self.library_root = Path(library_root) if library_root else None
+        self._paths: Dict[str, Path] = {}
+        self._built = False
+        # Copy workers may trigger the first lookup concurrently
+        self._build_lock = threading.Lock()
+
+    def build(self):
+        """Walk every attachment root once and index the PDFs found."""
+        self._paths.clear()
+        for base_path in self.base_paths:
+            if not base_path.exists():
+                continue
+
+            try:
+                for root, _, files in os.walk(base_path):
+                    pdf_files = sorted(f for f in files if f.lower().endswith('.pdf'))
+                    if not pdf_files:
+                        continue
+
+                    root_path = Path(root)
+                    # A directory maps to its first PDF, like the old glob did
+                    self._paths.setdefault(root_path.name, root_path / pdf_files[0])
+            except Exception as e:
+                logger.warning(f"Error indexing {base_path}: {e}")
+                continue
+
+        self._built = True
+        logger.info(f"Indexed {len(self._paths)} attachment keys")
+
+    def lookup(self, guid: str) -> Optional[Path]:
+        """Get the PDF in an attachment's GUID directory."""
+        self._ensure_built()
+        return self._paths.get(guid)
+
+    def resolve(self, filename: Optional[str]) -> Optional[Tuple[Path, os.stat_result]]:
+        """Resolve an attachment from its chat.db filename.
+
+        Returns the file and its stat, so callers can check its size without
+        another stat. The recorded path is checked first with a single stat;
+        the index is only built and searched when that path is missing.
+        Without a recorded path there is nothing that identifies the file,
+        so None is returned and the attachment is reported as missing.
+        """
+        if not filename:
+            return None
+        if self.library_root and filename.startswith(MESSAGES_PREFIX):
+            path = self.library_root / filename[len(MESSAGES_PREFIX):]
+        else:
+            path = Path(os.path.expanduser(filename))
+        found = self._stat_file(path)
+        if found:
+            return found
+
+        # The file may have moved with the home directory; its GUID
+        # directory still identifies it
+        path = self.lookup(path.parent.name)
+        return self._stat_file(path) if path else None
+
+    @staticmethod
+    def _stat_file(path: Path) -> Optional[Tuple[Path, os.stat_result]]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (path, st) if stat.S_ISREG(st.st_mode) else None
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self.build()
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._paths)
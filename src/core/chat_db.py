@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait on a lock held by Messages.app before giving up
+DEFAULT_BUSY_TIMEOUT = 10.0
+
+
+def connect_chat_db(db_path: Path, timeout: float = DEFAULT_BUSY_TIMEOUT) -> sqlite3.Connection:
+    """Open chat.db read-only so we never compete with Messages.app for the write lock."""
+    uri = f"{Path(db_path).expanduser().resolve().as_uri()}?mode=ro"
+    # ``timeout`` installs sqlite's busy handler, so a sync in progress is waited out
+    return sqlite3.connect(uri, uri=True, timeout=timeout, check_same_thread=False)
+
+
+def snapshot_chat_db(db_path: Path, timeout: float = DEFAULT_BUSY_TIMEOUT) -> Path:
+    """Copy chat.db, including pending WAL frames, into a private temp file."""
+    fd, snapshot_path = tempfile.mkstemp(prefix="chat_snapshot_", suffix=".db")
+    os.close(fd)
+
+    source = connect_chat_db(db_path, timeout)
+    try:
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    except Exception:
+        os.unlink(snapshot_path)
+        raise
+    finally:
+        source.close()
+
+    logger.info(f"Snapshotted {db_path} to {snapshot_path}")
+    return Path(snapshot_path)
+
+
+class ChatDatabase:
+    """Lazily opened, shared read-only connection to chat.db.
+
+    With ``snapshot=True`` the database is first copied with the sqlite backup
+    API, so long runs query a consistent copy that Messages.app never touches.
+    """
+
+    def __init__(self, db_path: Path, snapshot: bool = False, timeout: float = DEFAULT_BUSY_TIMEOUT):
+        self.db_path = Path(db_path)
+        self.snapshot = snapshot
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._snapshot_path: Optional[Path] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get the shared connection, opening it on first use."""
+        if self._conn is None:
+            if self.snapshot:
+                self._snapshot_path = snapshot_chat_db(self.db_path, self.timeout)
+                self._conn = connect_chat_db(self._snapshot_path, self.timeout)
+            else:
+                self._conn = connect_chat_db(self.db_path, self.timeout)
+        return self._conn
+
+    def close(self):
+        """Close the connection and remove any snapshot copy."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._snapshot_path is not None:
+            try:
+                self._snapshot_path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove snapshot {self._snapshot_path}: {e}")
+            self._snapshot_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
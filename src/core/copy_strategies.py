@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import os
+import sys
+import errno
+import shutil
+import ctypes
+import ctypes.util
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How extracted files are written:
+#   copy     - buffered copy through user space (shutil.copy2)
+#   clone    - copy-on-write reflink (FICLONE on Linux, clonefile on APFS)
+#   range    - kernel-side copy with copy_file_range or sendfile
+#   hardlink - a second name for the attachment itself; only for archive layouts
+COPY_MODES = ('copy', 'clone', 'range', 'hardlink')
+
+# Files are written as .<name>.partial next to their destination and renamed
+# into place once complete
+PARTIAL_SUFFIX = '.partial'
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+_clonefile = None
+if sys.platform == 'darwin':
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        _clonefile = _libc.clonefile
+        _clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+        _clonefile.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _clonefile = None
+
+
+def _same_volume(source: Path, dest: Path) -> bool:
+    try:
+        return os.stat(source).st_dev == os.stat(dest.parent).st_dev
+    except OSError:
+        return False
+
+
+def _clone(source: Path, dest: Path) -> bool:
+    """Reflink source to dest; returns False when the filesystem can't."""
+    if not _same_volume(source, dest):
+        return False
+
+    if _clonefile is not None:
+        if _clonefile(os.fsencode(source), os.fsencode(dest), 0) == 0:
+            return True
+        err = ctypes.get_errno()
+        if err in (errno.EACCES, errno.ENOSPC):
+            # A buffered copy would fail the same way
+            raise OSError(err, os.strerror(err), str(dest))
+        return False
+
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    # Leave nothing behind for the buffered fallback to trip over
+    os.unlink(dest)
+    return False
+
+
+def _copy_range(source: Path, dest: Path) -> bool:
+    """Copy in the kernel; returns False when no kernel-side copy is available."""
+    copy_range = getattr(os, 'copy_file_range', None)
+    if copy_range is None and not sys.platform.startswith('linux'):
+        # sendfile only takes a regular file as output on Linux
+        return False
+
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                if copy_range is not None:
+                    sent = copy_range(src.fileno(), dst.fileno(), remaining)
+                else:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), None, remaining)
+                if sent == 0:
+                    # The source shrank, or the kernel copied nothing for this
+                    # filesystem; a plain copy gets whatever is really there
+                    break
+                remaining -= sent
+            if not remaining:
+                return True
+            logger.debug(f"Kernel copy of {dest} stopped with {remaining} bytes left")
+        except OSError as e:
+            if remaining != os.fstat(src.fileno()).st_size:
+                # Failed part way through; a real I/O error, not a missing feature
+                raise
+            logger.debug(f"Kernel copy unavailable for {dest}: {e}")
+    os.unlink(dest)
+    return False
+
+
+def _hardlink(source: Path, dest: Path) -> bool:
+    try:
+        os.link(source, dest)
+        return True
+    except OSError as e:
+        # Cross-device links and filesystems without links fall back
+        logger.debug(f"Hardlink unavailable for {dest}: {e}")
+        return False
+
+
+def partial_path(dest: Path) -> Path:
+    """Get the temporary name a destination is written under."""
+    return dest.with_name(f".{dest.name}{PARTIAL_SUFFIX}")
+
+
+def is_partial(name: str) -> bool:
+    return name.startswith('.') and name.endswith(PARTIAL_SUFFIX)
+
+
+def copy_file(source: Path, dest: Path, mode: str = 'copy') -> str:
+    """Write dest from source with the requested strategy.
+
+    The data goes to a temporary file that is renamed over dest once it is
+    complete, so an interrupted copy never leaves a partial PDF under the
+    real name. Every mode falls back to a buffered copy when the fast path
+    isn't supported for this pair of files. Returns the mode that was used.
+    """
+    if mode not in COPY_MODES:
+        raise ValueError(f"Unknown copy mode {mode!r}; expected one of {', '.join(COPY_MODES)}")
+    source, dest = Path(source), Path(dest)
+    tmp_path = partial_path(dest)
+    try:
+        # Left over from a copy that was killed part way
+        os.unlink(tmp_path)
+    except FileNotFoundError:
+        pass
+
+    try:
+        used = _write(source, tmp_path, mode)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return used
+
+
+def _write(source: Path, dest: Path, mode: str) -> str:
+    if mode == 'clone' and _clone(source, dest):
+        shutil.copystat(source, dest)
+        return 'clone'
+    if mode == 'range' and _copy_range(source, dest):
+        shutil.copystat(source, dest)
+        return 'range'
+    if mode == 'hardlink' and _hardlink(source, dest):
+        return 'hardlink'
+
+    shutil.copy2(source, dest)
+    return 'copy'
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import os
+import hashlib
+import threading
+from pathlib import Path
+import logging
+import json
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HASH_INDEX_FILENAME = ".content_hashes.json"
+
+# Read size for streaming hashes; large enough to keep syscalls cheap
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Compute a streaming BLAKE2b digest of a file."""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """Content index of the PDFs already extracted into an output directory.
+
+    Files are grouped by size and only hashed when another file of the same
+    size turns up, so unique PDFs are never read twice. Duplicates are kept
+    as aliases of the first copy instead of being written again.
+
+    The index is shared by the copy workers: a destination is claimed before
+    its bytes are written, so two identical PDFs copied at the same time are
+    still caught, then committed or released once the copy has finished.
+    Files are hashed without holding the lock, which only guards the dicts.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / HASH_INDEX_FILENAME
+        # Relative path -> {"size": int, "digest": str or None}
+        self.files: Dict[str, Dict] = {}
+        # Relative path of a duplicate -> relative path of the stored copy
+        self.aliases: Dict[str, str] = {}
+        self._by_size: Dict[int, List[str]] = {}
+        # Claimed destinations still being copied -> their source file
+        self._sources: Dict[str, Path] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, output_dir: Path) -> "ContentIndex":
+        """Load the saved index, or seed it from PDFs already in the directory."""
+        index = cls(output_dir)
+        try:
+            with open(index.path) as f:
+                data = json.load(f)
+            index.files = data.get("files", {})
+            index.aliases = data.get("aliases", {})
+        except FileNotFoundError:
+            index._seed()
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Rebuilding unreadable content index {index.path}: {e}")
+            index.files = {}
+            index._seed()
+
+        for rel_path, entry in index.files.items():
+            index._by_size.setdefault(entry["size"], []).append(rel_path)
+        return index
+
+    def _seed(self):
+        """Record sizes of existing PDFs; their digests are computed on demand."""
+        if not self.output_dir.exists():
+            return
+        for root, _, files in os.walk(self.output_dir):
+            for name in files:
+                if not name.lower().endswith('.pdf'):
+                    continue
+                path = Path(root) / name
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                rel_path = str(path.relative_to(self.output_dir))
+                self.files[rel_path] = {"size": size, "digest": None}
+
+    def _hash_stored(self, paths: Dict[str, Path]):
+        """Fill in the digests of indexed files; called without the lock."""
+        for rel_path, path in paths.items():
+            try:
+                digest = file_digest(path)
+            except OSError:
+                digest = None
+            with self._lock:
+                entry = self.files.get(rel_path)
+                if entry is None or entry["digest"] is not None:
+                    continue
+                if digest is None:
+                    # The copy was removed from the output directory; forget it
+                    self._forget(rel_path)
+                else:
+                    entry["digest"] = digest
+
+    def known_digest(self, rel_path: str) -> Optional[str]:
+        """Get a stored file's digest if it has been computed; never hashes."""
+        with self._lock:
+            entry = self.files.get(rel_path)
+            return entry["digest"] if entry else None
+
+    def _forget(self, rel_path: str):
+        entry = self.files.pop(rel_path)
+        self._by_size[entry["size"]].remove(rel_path)
+        self._sources.pop(rel_path, None)
+
+    def claim(self, source_path: Path, size: int, dest_path: Path) -> Optional[str]:
+        """Claim a destination for a source unless its content is already stored.
+
+        Returns the relative path of the stored copy for a duplicate, or None
+        once the destination has been claimed and the source should be copied.
+        """
+        rel_path = str(Path(dest_path).relative_to(self.output_dir))
+        digest = None
+        while True:
+            with self._lock:
+                candidates = list(self._by_size.get(size, ()))
+                # A claimed copy may be half written; its source has the same bytes
+                unhashed = {candidate: self._sources.get(candidate, self.output_dir / candidate)
+                            for candidate in candidates if self.files[candidate]["digest"] is None}
+                if digest is not None:
+                    for candidate in candidates:
+                        if self.files[candidate]["digest"] == digest:
+                            return candidate
+                if not unhashed and (digest is not None or not candidates):
+                    if rel_path in self.files:
+                        # Overwriting a stored file with different content
+                        self._forget(rel_path)
+                    self._by_size.setdefault(size, []).append(rel_path)
+                    self.files[rel_path] = {"size": size, "digest": digest}
+                    self._sources[rel_path] = Path(source_path)
+                    return None
+
+            # Hash without the lock, then look again: files of this size may
+            # have been claimed meanwhile
+            if digest is None:
+                digest = file_digest(source_path)
+            self._hash_stored(unhashed)
+
+    def add(self, rel_path: str, size: int, digest: Optional[str] = None):
+        """Record a stored file that isn't indexed yet, e.g. from an interrupted run."""
+        with self._lock:
+            if rel_path in self.files:
+                return
+            self._by_size.setdefault(size, []).append(rel_path)
+            self.files[rel_path] = {"size": size, "digest": digest}
+
+    def commit(self, dest_path: Path):
+        """Mark a claimed destination as fully written."""
+        rel_path = str(Path(dest_path).relative_to(self.output_dir))
+        with self._lock:
+            self._sources.pop(rel_path, None)
+
+    def release(self, dest_path: Path):
+        """Drop a claim whose copy failed or was discarded."""
+        rel_path = str(Path(dest_path).relative_to(self.output_dir))
+        with self._lock:
+            if rel_path in self.files:
+                self._forget(rel_path)
+
+    def link_or_alias(self, dest_path: Path, original: str, hardlink: bool = False):
+        """Record a duplicate, optionally as a hardlink to the stored copy."""
+        if Path(dest_path) == self.output_dir / original:
+            # Re-extracting the very file that is stored
+            return
+        if hardlink:
+            try:
+                os.link(self.output_dir / original, dest_path)
+            except OSError as e:
+                logger.warning(f"Could not hardlink {dest_path}, keeping an alias: {e}")
+        self.add_alias(dest_path, original)
+
+    def add_alias(self, dest_path: Path, original: str):
+        """Record that a destination holds the same content as an earlier copy."""
+        rel_path = str(Path(dest_path).relative_to(self.output_dir))
+        with self._lock:
+            self.aliases[rel_path] = original
+
+    def save(self):
+        """Write the index atomically next to the extracted files."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with self._lock:
+            # Claims that were never committed did not produce a file
+            files = {k: v for k, v in self.files.items() if k not in self._sources}
+            with open(tmp_path, 'w') as f:
+                json.dump({"files": files, "aliases": self.aliases}, f, indent=2)
+        os.replace(tmp_path, self.path)
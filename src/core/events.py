@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Pending log lines kept between two UI ticks; older ones are dropped
+DEFAULT_MAX_LOGS = 500
+
+
+class EventChannel:
+    """Coalescing event channel from a worker thread to the UI.
+
+    It is a drop-in replacement for the ``Queue`` the extractors put events
+    on. Progress events collapse into the latest one, log lines are capped,
+    and the UI takes everything pending with a single ``drain()`` per tick.
+    ``notify`` is called from the worker thread whenever events arrive on an
+    empty channel, so the UI can wake up instead of polling.
+    """
+
+    def __init__(self, notify: Optional[Callable[[], None]] = None, max_logs: int = DEFAULT_MAX_LOGS):
+        self.notify = notify
+        self.max_logs = max_logs
+        self._lock = threading.Lock()
+        self._events = deque()
+        # Single-item holder for the pending progress event, kept in _events
+        self._progress: Optional[List[Dict]] = None
+        self._log_count = 0
+        # Placeholder standing in for log lines dropped since the last drain
+        self._dropped: Optional[List[Dict]] = None
+
+    def put(self, event: Dict, block: bool = True, timeout: Optional[float] = None):
+        """Add an event; same signature as ``Queue.put``."""
+        with self._lock:
+            was_empty = not self._events
+            if event.get('type') == 'progress':
+                if self._progress is not None:
+                    # Keep only the latest percent and text
+                    self._progress[0] = event
+                    return
+                self._progress = [event]
+                self._events.append(self._progress)
+            elif event.get('type') == 'log' and self._log_count >= self.max_logs:
+                if self._dropped is None:
+                    self._dropped = [{'type': 'log', 'text': '', 'dropped': 0}]
+                    self._events.append(self._dropped)
+                self._dropped[0]['dropped'] += 1
+            else:
+                if event.get('type') == 'log':
+                    self._log_count += 1
+                self._events.append([event])
+
+        if was_empty and self.notify:
+            self.notify()
+
+    put_nowait = put
+
+    def drain(self) -> List[Dict]:
+        """Take every pending event, in the order they were first queued."""
+        with self._lock:
+            if self._dropped is not None:
+                self._dropped[0]['text'] = f"... {self._dropped[0]['dropped']} more log lines skipped"
+            events = [holder[0] for holder in self._events]
+            self._events.clear()
+            self._progress = None
+            self._dropped = None
+            self._log_count = 0
+        return events
+
+    def empty(self) -> bool:
+        with self._lock:
+            return not self._events
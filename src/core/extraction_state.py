@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import os
+from pathlib import Path
+import logging
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = ".extraction_state.json"
+
+
+class ExtractionState:
+    """High-water mark of attachments already processed into an output directory.
+
+    Attachments whose file was not on disk yet (typically still in iCloud) are
+    kept as pending and retried on the next run even though they sit below
+    the mark. Attachments chat.db calls downloaded but whose file is gone are
+    kept apart, with the version of their chat.db row: retrying them means a
+    search of the whole attachment tree, so that only happens once the row
+    changes, or on a full run.
+    """
+
+    def __init__(self, output_dir: Path):
+        self.path = Path(output_dir) / STATE_FILENAME
+        self.last_attachment_id = 0
+        self.last_message_date: Optional[int] = None
+        self.pending_ids: Set[int] = set()
+        # Attachment ROWID -> version of its chat.db row when the file was missing
+        self.missing: Dict[int, str] = {}
+        # Manifest run that last saved this state; later unfinished runs are replayed
+        self.run_id = 0
+
+    @classmethod
+    def load(cls, output_dir: Path) -> "ExtractionState":
+        """Load the state saved by the previous run, if any."""
+        state = cls(output_dir)
+        try:
+            with open(state.path) as f:
+                data = json.load(f)
+            state.last_attachment_id = int(data.get("last_attachment_id", 0))
+            state.last_message_date = data.get("last_message_date")
+            state.pending_ids = {int(i) for i in data.get("pending_ids", [])}
+            state.missing = {int(i): str(version) for i, version in data.get("missing", {}).items()}
+            state.run_id = int(data.get("run_id", 0))
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable extraction state {state.path}: {e}")
+            state = cls(output_dir)
+        return state
+
+    def predicate(self, retry: Optional[Iterable[int]] = None,
+                  column: str = "attachment.ROWID") -> Tuple[str, List[Any]]:
+        """Build the SQL condition selecting attachments not processed yet.
+
+        ``retry`` narrows the pending and missing attachments to those worth
+        another try, e.g. the ones chat.db now reports as downloaded; by
+        default all are retried. They are passed as one JSON array, however
+        many there are.
+        """
+        waiting = self.pending_ids.union(self.missing)
+        retry = sorted(waiting if retry is None else waiting.intersection(retry))
+        if not retry:
+            return f"{column} > ?", [self.last_attachment_id]
+        return (f"({column} > ? OR {column} IN (SELECT value FROM json_each(?)))",
+                [self.last_attachment_id, json.dumps(retry)])
+
+    def record(self, attachment_id: int, message_date: Optional[int], found: bool = True,
+               version: Optional[str] = None):
+        """Mark an attachment as processed, or as pending if its file wasn't there.
+
+        Pass the ``version`` of its chat.db row when the file should have been
+        on disk but wasn't; it is then only retried once the row changes.
+        """
+        self.pending_ids.discard(attachment_id)
+        self.missing.pop(attachment_id, None)
+        if not found and version is not None:
+            self.missing[attachment_id] = version
+        elif not found:
+            self.pending_ids.add(attachment_id)
+        self.last_attachment_id = max(self.last_attachment_id, attachment_id)
+        if message_date is not None:
+            self.last_message_date = max(self.last_message_date or message_date, message_date)
+
+    def save(self):
+        """Write the state atomically next to the extracted files."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                "last_attachment_id": self.last_attachment_id,
+                "last_message_date": self.last_message_date,
+                "pending_ids": sorted(self.pending_ids),
+                "missing": {str(i): self.missing[i] for i in sorted(self.missing)},
+                "run_id": self.run_id
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
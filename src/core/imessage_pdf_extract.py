@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
 import os
-import sqlite3
-import shutil
-from datetime import datetime
+from datetime import date
 from pathlib import Path
 import logging
-import re
-from typing import List, Optional, Dict
+from typing import List, Optional, Tuple
 import argparse
-import json
+import sqlite3
+import sys
+import threading
+import time
+import cProfile
+import pstats
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from core import pdf_extractor
+from core.archive import MANIFEST_NAME, archive_format
+from core.layout import DEFAULT_LAYOUT, LAYOUT_FIELDS, OutputLayout
+from core.manifest import SKIP_REASONS
+from core.extraction_state import ExtractionState
+from core.parallel import DEFAULT_WORKERS
+from core.copy_strategies import COPY_MODES
+from core.chat_db import connect_chat_db
+from core.queries import PDFFilter, changed_ids, downloaded_ids
+from core.metrics import DEFAULT_METRICS_INTERVAL, MetricsTextfile
+from core.watch import ChatDBWatcher, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL
 
 # Set up logging
 logging.basicConfig(
@@ -17,218 +33,292 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-class IMessagePDFExtractor:
-    def __init__(self, output_dir: str = "extracted_pdfs", dry_run: bool = False, skip_validation: bool = False):
-        self.output_dir = Path(output_dir)
-        self.dry_run = dry_run
-        self.skip_validation = skip_validation
-        if not self.dry_run:
-            self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.chat_db_path = self._get_chat_db_path()
-        # Track skipped files and reasons
-        self.skipped_files: Dict[str, Dict] = {}
-        
-    def _get_chat_db_path(self) -> Path:
-        """Get the path to the iMessage chat database."""
-        home = Path.home()
-        chat_db = home / "Library/Messages/chat.db"
-        if not chat_db.exists():
-            raise FileNotFoundError("iMessage database not found. Make sure you have access to Messages.")
-        return chat_db
-
-    def _sanitize_filename(self, filename: str) -> str:
-        """Sanitize the filename to be safe for all filesystems."""
-        # Split filename and extension
-        name, ext = os.path.splitext(filename)
-        # Remove any path separators and null bytes
-        name = re.sub(r'[/\\\\:\*\?"<>\|\x00]', '_', name)
-        # Remove any leading/trailing spaces and dots
-        name = name.strip('. ')
-        # Ensure filename isn't empty
-        if not name:
-            name = 'unnamed_pdf'
-        return f"{name}{ext}"
-
-    def _is_valid_pdf(self, file_path: Path) -> bool:
-        """Basic validation that file appears to be a PDF."""
-        if self.skip_validation:
-            return True
-            
-        try:
-            if not file_path.exists() or not file_path.is_file():
-                return False
-            
-            # Check file size (must be between 100 bytes and 2GB)
-            size = file_path.stat().st_size
-            if size < 100 or size > 2_000_000_000:
-                return False
-            
-            # Check PDF magic number
-            with open(file_path, 'rb') as f:
-                header = f.read(4)
-                return header.startswith(b'%PDF')
-                
-        except Exception as e:
-            logger.warning(f"Error validating PDF {file_path}: {e}")
-            return False
-
-    def _get_attachment_path(self, attachment_id: str) -> Optional[Path]:
-        """Get the full path of an attachment from its ID."""
-        home = Path.home()
-        base_path = home / "Library/Messages/Attachments"
-        
+# In watch mode, how often attachments still missing are retried without a database change
+PENDING_RETRY_INTERVAL = 60.0
+
+# In watch mode, the wait after a failed cycle; it doubles with every failure in a row
+ERROR_RETRY_INTERVAL = 5.0
+MAX_ERROR_RETRY_INTERVAL = 300.0
+
+class IMessagePDFExtractor(pdf_extractor.IMessagePDFExtractor):
+    """The GUI's extractor, plus what the command line adds on top.
+
+    Extraction itself is the core class's; this adds an archive chosen up
+    front, the metrics textfile and watch mode.
+    """
+
+    def __init__(self, output_dir: str = "extracted_pdfs", dry_run: bool = False, skip_validation: bool = False,
+                 snapshot: bool = False, link_duplicates: bool = False, workers: int = DEFAULT_WORKERS,
+                 copy_mode: str = 'copy', structural_check: bool = False, library_root: Optional[str] = None,
+                 metrics_file: Optional[str] = None, metrics_interval: float = DEFAULT_METRICS_INTERVAL,
+                 archive: Optional[str] = None, layout: str = DEFAULT_LAYOUT):
+        # ZIP or tar file to stream PDFs into instead of the output directory
+        self.archive_path = Path(archive).expanduser() if archive else None
+        if self.archive_path:
+            archive_format(self.archive_path)
+        super().__init__(output_dir, skip_validation=skip_validation, snapshot=snapshot,
+                         link_duplicates=link_duplicates, workers=workers, copy_mode=copy_mode,
+                         structural_check=structural_check, library_root=library_root, layout=layout,
+                         dry_run=dry_run)
+        # OpenMetrics textfile rewritten during and after real runs
+        self.metrics = MetricsTextfile(metrics_file, metrics_interval) if metrics_file else None
+        # Attachments the last real run couldn't find yet
+        self.pending_retries = 0
+        # One profiler per thread while profile() runs, else None
+        self._profilers: Optional[List[cProfile.Profile]] = None
+        self._thread = threading.local()
+
+    def _timed_extract_one(self, row, content_index):
+        if self._profilers is None:
+            return super()._timed_extract_one(row, content_index)
+        # cProfile only sees the thread it was enabled on, so each copy worker gets its own
+        profiler = getattr(self._thread, 'profiler', None)
+        if profiler is None:
+            profiler = self._thread.profiler = cProfile.Profile()
+            self._profilers.append(profiler)
+        return profiler.runcall(super()._timed_extract_one, row, content_index)
+
+    def profile(self, path: str, **kwargs):
+        """Run extract_pdfs under cProfile and dump the stats of every thread to ``path``."""
+        self._profilers = [cProfile.Profile()]
         try:
-            # More efficient search using glob
-            pattern = f"**/*{attachment_id}*"
-            matches = list(base_path.glob(pattern))
-            return matches[0] if matches else None
-        except Exception as e:
-            logger.warning(f"Error finding attachment {attachment_id}: {e}")
+            self._profilers[0].runcall(self.extract_pdfs, **kwargs)
+        finally:
+            profilers, self._profilers = self._profilers, None
+            self._thread = threading.local()
+            stats = pstats.Stats(profilers[0])
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(path)
+
+    def _metric_families(self, running: bool, pending: int) -> List:
+        """Describe the current run for the metrics textfile."""
+        duration = self.stats.elapsed()
+        counts = self.manifest.status_counts()
+        bytes_copied = self.stats.stages.get('copy', {}).get('bytes', 0)
+        return [
+            ("running", "gauge", "Whether an extraction run is in progress.", [({}, int(running))]),
+            ("last_run_start_timestamp_seconds", "gauge", "Start time of the latest run.",
+             [({}, round(self.stats.started, 3))]),
+            ("duration_seconds", "gauge", "Time spent in the latest run so far.", [({}, round(duration, 3))]),
+            ("files_found", "gauge", "PDF attachments queried in the latest run.", [({}, self.total_found)]),
+            ("files_copied", "gauge", "PDFs copied in the latest run.", [({}, self.successful_copies)]),
+            ("files_skipped", "gauge", "PDFs not copied in the latest run, by reason.",
+             [({"reason": reason}, counts.get(reason, 0)) for reason in sorted(('exists', *SKIP_REASONS))]),
+            ("files_deduplicated", "gauge", "PDFs whose content had already been extracted.",
+             [({}, self.deduplicated)]),
+            ("bytes_copied", "gauge", "Bytes copied in the latest run.", [({}, bytes_copied)]),
+            ("files_per_second", "gauge", "Copy throughput of the latest run.",
+             [({}, round(self.successful_copies / duration, 3) if duration else 0)]),
+            ("bytes_per_second", "gauge", "Copy throughput of the latest run.",
+             [({}, round(bytes_copied / duration, 1) if duration else 0)]),
+            ("pending_retries", "gauge", "Attachments waiting to be retried, e.g. not downloaded yet.",
+             [({}, pending)]),
+        ]
+
+    def _write_metrics(self, running: bool, state: ExtractionState):
+        if self.metrics and not self.dry_run:
+            self.metrics.write(self._metric_families(running, len(state.pending_ids)))
+
+    def _run_started(self, state: ExtractionState):
+        self._write_metrics(True, state)
+
+    def _row_handled(self, state: ExtractionState):
+        if self.metrics and self.metrics.due():
+            self._write_metrics(True, state)
+
+    def _run_finished(self, state: ExtractionState):
+        self._write_metrics(False, state)
+        if not (self.dry_run or self.archive_path):
+            self.pending_retries = len(state.pending_ids)
+
+    def extract_pdfs(self, full: bool = False, filters: Optional[PDFFilter] = None, reuse: bool = False):
+        """Extract PDFs as the GUI does, into the archive if one was given.
+
+        See pdf_extractor.IMessagePDFExtractor.extract_pdfs for what is
+        queried and recorded, and for ``reuse``.
+        """
+        logger.info("Scanning for PDF attachments...")
+        if self.dry_run:
+            logger.info("DRY RUN: No files will be copied")
+        super().extract_pdfs(full=full, filters=filters, archive=self.archive_path, reuse=reuse)
+
+        if self.dry_run:
+            logger.info(f"DRY RUN complete. Found {self.total_found} PDF attachments; "
+                        f"would have copied them to: {self.archive_path or self.output_dir}")
+        elif not self.total_found:
+            logger.info(f"No new PDFs to extract into {self.archive_path or self.output_dir}")
+        elif self.archive_path:
+            logger.info(f"PDF extraction complete. Archived {self.successful_copies} of {self.total_found} PDFs "
+                        f"to: {self.archive_path} (summary in {MANIFEST_NAME})")
+        else:
+            logger.info(f"PDF extraction complete. Successfully copied {self.successful_copies} of {self.total_found} PDFs to: {self.output_dir}")
+            logger.info(f"Detailed summary saved to {self.output_dir}/extraction_summary.txt")
+
+    def _attachment_signature(self, connection: sqlite3.Connection, newest: Optional[int]) -> Optional[Tuple]:
+        """Summarize what an incremental run could find, from the live chat.db.
+
+        That is the ``newest`` attachment ROWID and which waiting attachments
+        have arrived or changed; text messages leave it as it is. None until
+        a run has kept its progress in memory.
+        """
+        if self._kept is None:
             return None
+        state = self._kept[0]
+        cursor = connection.cursor()
+        try:
+            return (newest, frozenset(downloaded_ids(cursor, state.pending_ids)),
+                    frozenset(changed_ids(cursor, state.missing)))
+        finally:
+            cursor.close()
 
-    def _save_summary(self):
-        """Save a detailed summary of the extraction process."""
-        if not self.dry_run:
-            summary_file = self.output_dir / "extraction_summary.json"
-            with open(summary_file, 'w') as f:
-                json.dump({
-                    "timestamp": datetime.now().isoformat(),
-                    "total_pdfs_found": self.total_found,
-                    "successfully_copied": self.successful_copies,
-                    "skipped_files": self.skipped_files
-                }, f, indent=2)
-            
-            # Also create a human-readable summary
-            readable_summary = self.output_dir / "extraction_summary.txt"
-            with open(readable_summary, 'w') as f:
-                f.write(f"PDF Extraction Summary\n")
-                f.write(f"===================\n\n")
-                f.write(f"Timestamp: {datetime.now()}\n")
-                f.write(f"Total PDFs found: {self.total_found}\n")
-                f.write(f"Successfully copied: {self.successful_copies}\n")
-                f.write(f"Skipped files: {len(self.skipped_files)}\n\n")
-                
-                if self.skipped_files:
-                    f.write("Skipped Files Details:\n")
-                    f.write("=====================\n\n")
-                    for filename, details in self.skipped_files.items():
-                        f.write(f"File: {filename}\n")
-                        f.write(f"Reason: {details['reason']}\n")
-                        f.write(f"Timestamp: {details['timestamp']}\n")
-                        if 'error' in details:
-                            f.write(f"Error: {details['error']}\n")
-                        f.write("\n")
-
-    def extract_pdfs(self):
-        """Extract all PDFs from iMessage database."""
+    def watch(self, min_interval: float = MIN_POLL_INTERVAL, max_interval: float = MAX_POLL_INTERVAL,
+              full: bool = False):
+        """Extract new PDFs now and whenever chat.db changes, until interrupted.
+
+        Runs keep the output directory's listing and content index in memory
+        between cycles. A change that adds no attachment, such as a text
+        message, is noticed with a small query on the live chat.db and
+        doesn't start a run. A failed cycle is logged and retried with a
+        growing delay instead of ending the watch.
+        """
+        watcher = ChatDBWatcher(self.chat_db_path, min_interval, max_interval)
+        live: Optional[sqlite3.Connection] = None
+        last_signature = None
+        failures = 0
+        run_now = True
+        logger.info(f"Watching {self.chat_db_path} for new PDFs (Ctrl+C to stop)")
         try:
-            # Create a connection to the chat database
-            conn = sqlite3.connect(self.chat_db_path)
-            cursor = conn.cursor()
-            
-            # Query to get all PDF attachments
-            query = """
-            SELECT 
-                message.ROWID,
-                message.date,
-                attachment.filename,
-                attachment.ROWID as attachment_id
-            FROM message
-            JOIN message_attachment_join ON message.ROWID = message_attachment_join.message_id
-            JOIN attachment ON message_attachment_join.attachment_id = attachment.ROWID
-            WHERE attachment.filename LIKE '%.pdf'
-            ORDER BY message.date DESC
-            """
-            
-            cursor.execute(query)
-            results = cursor.fetchall()
-            
-            self.total_found = len(results)
-            logger.info(f"Found {self.total_found} PDF attachments")
-            if self.dry_run:
-                logger.info("DRY RUN: No files will be copied")
-            
-            self.successful_copies = 0
-            for row in results:
-                message_id, date, filename, attachment_id = row
-                attachment_path = self._get_attachment_path(str(attachment_id))
-                
-                if not attachment_path or not attachment_path.exists():
-                    self.skipped_files[filename] = {
-                        "reason": "File not found",
-                        "timestamp": datetime.fromtimestamp(date/1e9).isoformat(),
-                        "attachment_id": str(attachment_id)
-                    }
-                    logger.warning(f"Could not find attachment: {filename}")
-                    continue
-                
-                # Validate the PDF
-                if not self._is_valid_pdf(attachment_path):
-                    self.skipped_files[filename] = {
-                        "reason": "Invalid PDF",
-                        "timestamp": datetime.fromtimestamp(date/1e9).isoformat(),
-                        "path": str(attachment_path)
-                    }
-                    logger.warning(f"Skipping invalid PDF: {filename}")
+            while True:
+                changed = False
+                if not run_now:
+                    # Files still downloading are retried even if nothing else changes
+                    timeout = PENDING_RETRY_INTERVAL if self.pending_retries else None
+                    changed = watcher.wait_for_change(timeout=timeout)
+                run_now = False
+                try:
+                    if live is None:
+                        live = connect_chat_db(self.chat_db_path)
+                    newest = live.execute("SELECT MAX(ROWID) FROM attachment").fetchone()[0]
+                    if (changed and last_signature is not None
+                            and self._attachment_signature(live, newest) == last_signature):
+                        continue
+                    if changed:
+                        logger.info("Messages database changed, looking for new PDFs")
+                    if self.chat_db.snapshot:
+                        # The next query takes a fresh copy that includes the new rows
+                        self.chat_db.close()
+                    # Incremental: only rows above the saved mark, plus pending retries
+                    self.extract_pdfs(full=full, reuse=True)
+                    full = False
+                    # Rows added during the run are above ``newest``, so they still count as a change
+                    last_signature = self._attachment_signature(live, newest)
+                    failures = 0
                     continue
-                    
-                # Create a unique filename using original name and timestamp
-                timestamp = datetime.fromtimestamp(date/1e9).strftime('%Y%m%d_%H%M%S')
-                safe_filename = self._sanitize_filename(filename)
-                name, ext = os.path.splitext(safe_filename)
-                new_filename = f"{name}_{timestamp}{ext}"
-                target_path = self.output_dir / new_filename
-                
-                # Copy the file to the output directory
-                if not self.dry_run:
-                    try:
-                        shutil.copy2(attachment_path, target_path)
-                        self.successful_copies += 1
-                        logger.info(f"Copied: {filename}")
-                    except Exception as e:
-                        self.skipped_files[filename] = {
-                            "reason": "Copy failed",
-                            "timestamp": datetime.fromtimestamp(date/1e9).isoformat(),
-                            "error": str(e),
-                            "source": str(attachment_path),
-                            "target": str(target_path)
-                        }
-                        logger.error(f"Failed to copy {filename}: {e}")
-                else:
-                    logger.info(f"Would copy: {filename}")
-            
-            conn.close()
-            
-            # Save the summary
-            if not self.dry_run:
-                self._save_summary()
-            
-            if self.dry_run:
-                logger.info(f"DRY RUN complete. Would have copied {len(results)} PDFs to: {self.output_dir}")
-            else:
-                logger.info(f"PDF extraction complete. Successfully copied {self.successful_copies} of {self.total_found} PDFs to: {self.output_dir}")
-                logger.info(f"Detailed summary saved to {self.output_dir}/extraction_summary.txt")
-            
-        except sqlite3.Error as e:
-            logger.error(f"Database error: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"An error occurred: {e}")
-            raise
+                except Exception as e:
+                    failures += 1
+                    delay = min(ERROR_RETRY_INTERVAL * 2 ** (failures - 1), MAX_ERROR_RETRY_INTERVAL)
+                    logger.error(f"Watch cycle failed, retrying in {delay:g}s: {e}")
+                    # Start over from the database and the output directory on disk
+                    self.chat_db.close()
+                    if live is not None:
+                        live.close()
+                        live = None
+                    last_signature = None
+                time.sleep(delay)
+                run_now = True
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+        finally:
+            if live is not None:
+                live.close()
+            watcher.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Extract PDFs from iMessage history')
     parser.add_argument('--output-dir', default='extracted_pdfs', help='Directory to save PDFs to')
     parser.add_argument('--skip-validation', action='store_true', help='Skip PDF validation (faster but less safe)')
     parser.add_argument('--no-dry-run', action='store_true', help='Skip dry run and copy files immediately')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the saved progress and process every PDF again')
+    parser.add_argument('--link-duplicates', action='store_true',
+                        help='Hardlink PDFs whose content was already extracted instead of only listing them')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Number of files to resolve and copy concurrently (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--copy-mode', choices=COPY_MODES, default='copy',
+                        help='How to write files: buffered copy, reflink clone, kernel range copy or hardlink; '
+                             'falls back to a buffered copy when unsupported')
+    parser.add_argument('--check-structure', action='store_true',
+                        help='Also reject PDFs whose tail lacks startxref/%%%%EOF (truncated downloads)')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='Query a private copy of chat.db instead of the live database')
+    parser.add_argument('--library-root',
+                        help='Messages folder holding chat.db and Attachments (default: ~/Library/Messages)')
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help='Write run metrics in OpenMetrics text format to FILE (e.g. for node_exporter)')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help=f'Seconds between metrics updates during a run (default: {DEFAULT_METRICS_INTERVAL:g})')
+    parser.add_argument('--layout', default=DEFAULT_LAYOUT, metavar='TEMPLATE',
+                        help=f'Where each PDF goes under the output directory (default: {DEFAULT_LAYOUT}); '
+                             f'fields: {", ".join(LAYOUT_FIELDS)}; must include {{attachment_id}}')
+    parser.add_argument('--archive', metavar='FILE',
+                        help='Write the PDFs into one ZIP (stored, not compressed) or tar file with a manifest, '
+                             'instead of the output directory; the type comes from the .zip/.tar extension')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and extract new PDFs as they arrive in Messages')
+    parser.add_argument('--poll-interval', type=float, default=MIN_POLL_INTERVAL,
+                        help=f'Seconds between checks for changes in watch mode right after activity '
+                             f'(default: {MIN_POLL_INTERVAL:g}); backs off while idle')
+    parser.add_argument('--max-poll-interval', type=float, default=MAX_POLL_INTERVAL,
+                        help=f'Longest wait between checks in watch mode (default: {MAX_POLL_INTERVAL:g})')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='Write a cProfile dump of the extraction, copy workers included, to FILE '
+                             '(view with python -m pstats)')
+    filter_group = parser.add_argument_group('filters', 'Only extract matching PDFs; filtered runs ignore and keep '
+                                                        'the saved progress')
+    filter_group.add_argument('--since', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                              help='Only PDFs sent on or after this day')
+    filter_group.add_argument('--until', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                              help='Only PDFs sent on or before this day')
+    filter_group.add_argument('--sender', action='append', default=[], metavar='HANDLE',
+                              help='Only PDFs from this phone number or email, as stored by Messages (repeatable)')
+    filter_group.add_argument('--chat', action='append', default=[], metavar='CHAT_ID',
+                              help='Only PDFs in the chat with this identifier (repeatable)')
+    filter_group.add_argument('--min-size', type=int, metavar='BYTES', help='Only PDFs at least this large')
+    filter_group.add_argument('--max-size', type=int, metavar='BYTES', help='Only PDFs at most this large')
+    filter_group.add_argument('--name', metavar='GLOB',
+                              help="Only PDFs whose file name matches this case-insensitive glob, e.g. '*invoice*'")
     args = parser.parse_args()
+    pdf_filter = PDFFilter(since=args.since, until=args.until, senders=args.sender, chats=args.chat,
+                           min_size=args.min_size, max_size=args.max_size, name=args.name)
+    if args.watch and not pdf_filter.is_empty():
+        # Without the saved progress every cycle would process all matches again
+        parser.error("--watch cannot be combined with filters")
+    try:
+        OutputLayout(args.layout)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.archive:
+        if args.watch:
+            parser.error("--watch cannot be combined with --archive")
+        try:
+            archive_format(args.archive)
+        except ValueError as e:
+            parser.error(str(e))
 
+    extractor = None
     try:
+        extractor = IMessagePDFExtractor(output_dir=args.output_dir, dry_run=not args.no_dry_run,
+                                         skip_validation=args.skip_validation, snapshot=args.snapshot,
+                                         link_duplicates=args.link_duplicates, workers=args.workers,
+                                         copy_mode=args.copy_mode, structural_check=args.check_structure,
+                                         library_root=args.library_root, metrics_file=args.metrics_file,
+                                         metrics_interval=args.metrics_interval, archive=args.archive,
+                                         layout=args.layout)
         if not args.no_dry_run:
             # First do a dry run to show what would happen
             logger.info("Performing dry run first...")
-            extractor = IMessagePDFExtractor(output_dir=args.output_dir, dry_run=True, skip_validation=args.skip_validation)
-            extractor.extract_pdfs()
+            extractor.extract_pdfs(full=args.full, filters=pdf_filter)
             
             # Ask for confirmation before proceeding
             response = input("\nWould you like to proceed with copying the files? (yes/no): ").lower().strip()
@@ -236,14 +326,27 @@ def main():
                 logger.info("Operation cancelled by user")
                 return 0
         
-        # Proceed with actual extraction
+        # Proceed with actual extraction on the same connection
         logger.info("\nProceeding with file extraction...")
-        extractor = IMessagePDFExtractor(output_dir=args.output_dir, dry_run=False, skip_validation=args.skip_validation)
-        extractor.extract_pdfs()
+        extractor.dry_run = False
+        if args.profile:
+            try:
+                extractor.profile(args.profile, full=args.full, filters=pdf_filter, reuse=args.watch)
+            finally:
+                logger.info(f"Profile written to {args.profile}")
+        elif not args.watch:
+            extractor.extract_pdfs(full=args.full, filters=pdf_filter)
+        
+        if args.watch:
+            # Without a profile, the first cycle is the real run, with the watch's error handling
+            extractor.watch(args.poll_interval, args.max_poll_interval, full=args.full and not args.profile)
         return 0
     except Exception as e:
         logger.error(f"Failed to extract PDFs: {e}")
         return 1
+    finally:
+        if extractor:
+            extractor.close()
 
 if __name__ == "__main__":
     exit(main())
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import os
+import re
+import string
+import threading
+from datetime import datetime
+from pathlib import Path
+import logging
+from typing import Optional, Set
+
+from core.copy_strategies import PARTIAL_SUFFIX, is_partial
+
+logger = logging.getLogger(__name__)
+
+# Sharded by month so no directory grows without bound; the attachment ID
+# makes every name unique without checking the disk
+DEFAULT_LAYOUT = "{year}/{month}/{name}_{attachment_id}{ext}"
+
+LAYOUT_FIELDS = ('year', 'month', 'day', 'date', 'sender', 'chat', 'name', 'ext', 'attachment_id', 'shard')
+
+_UNSAFE = re.compile(r'[/\\:*?"<>|\x00]')
+_EXTENSION = re.compile(r'\.[a-z0-9]{1,10}')
+
+# Names are limited to 255 bytes (not characters) on APFS, ext4 and most
+# others; a file name also has to fit while it is written as .<name>.partial
+NAME_MAX = 255
+MAX_FILE_NAME = NAME_MAX - len(f".{PARTIAL_SUFFIX}".encode())
+
+
+def safe_component(value: str, fallback: str = 'unknown', max_bytes: int = NAME_MAX) -> str:
+    """Make a value usable as one path component on any filesystem.
+
+    Long values are cut to ``max_bytes`` of UTF-8, never inside a character.
+    """
+    value = _UNSAFE.sub('_', value).strip('. ')
+    value = value.encode('utf-8')[:max(max_bytes, 0)].decode('utf-8', 'ignore').rstrip('. ')
+    return value or fallback
+
+
+class OutputLayout:
+    """Where each extracted PDF goes, from a template like DEFAULT_LAYOUT.
+
+    Fields are year, month, day, date (YYYY-MM-DD), sender, chat, name
+    (file name without extension), ext, attachment_id and shard (the
+    attachment ID mod 256 in hex, for flat layouts). ``/`` in the template
+    makes subdirectories; values never do. The template must contain
+    ``{attachment_id}`` so that destinations can't collide.
+
+    Destinations already in the output directory are listed once by
+    ``scan``; ``claim`` then checks and reserves them in memory, so the copy
+    workers never stat a destination to see whether it is taken.
+    """
+
+    def __init__(self, template: str = DEFAULT_LAYOUT):
+        fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+        unknown = fields - set(LAYOUT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown layout field(s) {', '.join(sorted(unknown))}; "
+                             f"use {', '.join(LAYOUT_FIELDS)}")
+        if 'attachment_id' not in fields:
+            raise ValueError("The layout must include {attachment_id} to keep file names unique")
+        if template.startswith('/') or '..' in template.split('/'):
+            raise ValueError("The layout must stay inside the output directory")
+        self.template = template
+        self._taken: Set[str] = set()
+        self._made_dirs: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def path_for(self, attachment_id: int, filename: Optional[str], date: Optional[datetime],
+                 sender: Optional[str] = None, chat: Optional[str] = None) -> str:
+        """Get the destination of an attachment, relative to the output directory."""
+        name, ext = os.path.splitext(os.path.basename(filename or ''))
+        ext = ext.lower()
+        fields = dict(
+            year=f"{date:%Y}" if date else 'unknown',
+            month=f"{date:%m}" if date else 'unknown',
+            day=f"{date:%d}" if date else 'unknown',
+            date=f"{date:%Y-%m-%d}" if date else 'unknown',
+            sender=safe_component(sender or '', 'Unknown'),
+            chat=safe_component(chat or '', 'Unknown'),
+            name=safe_component(name, 'unnamed_pdf'),
+            ext=ext if _EXTENSION.fullmatch(ext) else '.pdf',
+            attachment_id=attachment_id,
+            shard=f"{attachment_id % 256:02x}"
+        )
+        path = self.template.format(**fields)
+        # Shorten the name by however much the file name, with the ID,
+        # extension and partial prefix and suffix, runs over
+        overflow = len(os.path.basename(path).encode('utf-8')) - MAX_FILE_NAME
+        if overflow > 0:
+            fields['name'] = safe_component(name, 'unnamed_pdf', len(fields['name'].encode('utf-8')) - overflow)
+            path = self.template.format(**fields)
+        return path
+
+    def scan(self, output_dir: Optional[Path], remove_partial: bool = True):
+        """Load the files already in the output directory, in one walk.
+
+        Temporary files left by copies that were interrupted are skipped, and
+        removed unless ``remove_partial`` is False. With no directory, e.g. when writing an archive, nothing is taken.
+        """
+        taken = set()
+        for root, _, files in os.walk(output_dir) if output_dir else ():
+            rel_root = os.path.relpath(root, output_dir)
+            for name in files:
+                if is_partial(name):
+                    if not remove_partial:
+                        continue
+                    try:
+                        os.unlink(os.path.join(root, name))
+                        logger.info(f"Removed incomplete copy {os.path.join(rel_root, name)}")
+                    except OSError as e:
+                        logger.warning(f"Could not remove incomplete copy {name}: {e}")
+                    continue
+                taken.add(name if rel_root == '.' else f"{rel_root}/{name}".replace(os.sep, '/'))
+        with self._lock:
+            self._taken = taken
+            self._made_dirs = set()
+
+    def claim(self, rel_path: str) -> bool:
+        """Reserve a destination; False if it exists or is already reserved."""
+        with self._lock:
+            if rel_path in self._taken:
+                return False
+            self._taken.add(rel_path)
+            return True
+
+    def is_taken(self, rel_path: Optional[str]) -> bool:
+        """Check whether a destination exists or is reserved, without reserving it."""
+        with self._lock:
+            return rel_path in self._taken
+
+    def release(self, rel_path: str):
+        """Give back a destination that wasn't written."""
+        with self._lock:
+            self._taken.discard(rel_path)
+
+    def make_parent(self, output_dir: Path, rel_path: str) -> Path:
+        """Create the destination's directory on first use; returns the full path."""
+        dest_path = Path(output_dir) / rel_path
+        parent = os.path.dirname(rel_path)
+        if parent:
+            with self._lock:
+                if parent not in self._made_dirs:
+                    dest_path.parent.mkdir(parents=True, exist_ok=True)
+                    self._made_dirs.add(parent)
+        return dest_path
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+import os
+import json
+import sqlite3
+import tempfile
+from datetime import datetime
+from pathlib import Path
+import logging
+from typing import Any, Dict, Iterator, List, Optional
+
+from core.queries import row_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "extraction_manifest.db"
+
+# Rows buffered before one executemany; a crash loses at most this many
+BATCH_SIZE = 500
+
+# Outcomes reported as skipped, with their description in the summaries
+SKIP_REASONS = {
+    'not_downloaded': "Not downloaded (stored in iCloud)",
+    'missing': "File not found",
+    'truncated': "Incomplete download",
+    'invalid': "Invalid PDF",
+    'copy_failed': "Copy failed",
+    'error': "Error"
+}
+
+# Outcomes that count as done: a resumed run doesn't try these again
+PROCESSED_STATUSES = ('copied', 'duplicate', 'exists', 'invalid')
+
+# How a run chose its attachments. Incremental and full runs go through
+# chat.db in ROWID order, so an interrupted one can be resumed from its rows.
+RUN_MODES = ('incremental', 'full', 'filtered', 'selection')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    finished TEXT,
+    mode TEXT,
+    dry_run INTEGER NOT NULL DEFAULT 0,
+    filters TEXT,
+    total_found INTEGER,
+    timings TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    attachment_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    filename TEXT,
+    source TEXT,
+    dest TEXT,
+    size INTEGER,
+    digest TEXT,
+    detail TEXT,
+    message_date TEXT,
+    seconds REAL,
+    recorded TEXT NOT NULL,
+    PRIMARY KEY (run_id, attachment_id)
+);
+CREATE INDEX IF NOT EXISTS files_idx_attachment ON files (attachment_id, run_id);
+CREATE INDEX IF NOT EXISTS files_idx_status ON files (run_id, status);
+-- The latest outcome of every attachment across runs
+CREATE VIEW IF NOT EXISTS latest_files AS
+    SELECT files.* FROM files
+    JOIN (SELECT attachment_id, MAX(run_id) AS run_id FROM files GROUP BY attachment_id) AS latest
+    USING (attachment_id, run_id);
+"""
+
+FILE_COLUMNS = ('run_id', 'attachment_id', 'status', 'filename', 'source', 'dest', 'size', 'digest', 'detail',
+                'message_date', 'seconds', 'recorded')
+
+
+class ExtractionManifest:
+    """What happened to every attachment, in a SQLite database beside the PDFs.
+
+    Each run adds a row to ``runs`` and one row per attachment to ``files``
+    as it goes. Rows are buffered and inserted in batches; WAL lets audit
+    queries read while a run writes. Volumes that can't share WAL's index,
+    such as network shares, get a rollback journal instead. The summaries are
+    generated from the database, so nothing per file is kept in memory.
+    """
+
+    def __init__(self, path, temporary: bool = False):
+        self.path = Path(path)
+        self.temporary = temporary
+        self.connection = sqlite3.connect(str(self.path))
+        self.wal = self._journal_mode('WAL') == 'wal'
+        if not self.wal:
+            logger.info(f"WAL is not available for {self.path}; using a rollback journal")
+            self._journal_mode('DELETE')
+        # With WAL, NORMAL only risks the last commits on power loss, never
+        # corruption; a rollback journal needs FULL for that
+        self.connection.execute(f"PRAGMA synchronous={'NORMAL' if self.wal else 'FULL'}")
+        self.connection.executescript(SCHEMA)
+        self.run_id: Optional[int] = None
+        self._pending: List[tuple] = []
+
+    def _journal_mode(self, mode: str) -> Optional[str]:
+        """Switch the journal mode; returns the mode SQLite actually uses."""
+        try:
+            return self.connection.execute(f"PRAGMA journal_mode={mode}").fetchone()[0].lower()
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Could not set journal_mode={mode} for {self.path}: {e}")
+            return None
+
+    @classmethod
+    def open(cls, output_dir: Path) -> "ExtractionManifest":
+        return cls(Path(output_dir) / MANIFEST_FILENAME)
+
+    @classmethod
+    def temporary_file(cls) -> "ExtractionManifest":
+        """A manifest for runs that don't write an output directory; removed on close."""
+        fd, path = tempfile.mkstemp(prefix="extraction_manifest.", suffix=".db")
+        os.close(fd)
+        return cls(path, temporary=True)
+
+    def start_run(self, mode: str = 'incremental', dry_run: bool = False,
+                  filters: Optional[Dict[str, Any]] = None) -> int:
+        """Add a run; ``mode`` is one of RUN_MODES."""
+        if mode not in RUN_MODES:
+            raise ValueError(f"Unknown run mode {mode!r}; expected one of {', '.join(RUN_MODES)}")
+        cursor = self.connection.execute(
+            "INSERT INTO runs (started, mode, dry_run, filters) VALUES (?, ?, ?, ?)",
+            (datetime.now().isoformat(), mode, int(dry_run), json.dumps(filters) if filters else None)
+        )
+        self.connection.commit()
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def record(self, attachment_id: int, status: str, filename: Optional[str] = None, source=None, dest=None,
+               size: Optional[int] = None, digest: Optional[str] = None, detail=None,
+               message_date: Optional[datetime] = None, seconds: Optional[float] = None):
+        """Add an attachment's outcome; written with the next batch."""
+        self._pending.append((
+            self.run_id, attachment_id, status, filename,
+            str(source) if source is not None else None,
+            str(dest) if dest is not None else None,
+            size, digest,
+            str(detail) if detail is not None else None,
+            message_date.isoformat() if message_date else None,
+            round(seconds, 6) if seconds is not None else None,
+            datetime.now().isoformat()
+        ))
+        if len(self._pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self.connection.executemany(
+            f"INSERT INTO files ({', '.join(FILE_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(FILE_COLUMNS))})",
+            self._pending
+        )
+        self.connection.commit()
+        self._pending.clear()
+
+    def finish_run(self, total_found: int, timings: Optional[Dict[str, Any]] = None):
+        self.flush()
+        self.connection.execute(
+            "UPDATE runs SET finished = ?, total_found = ?, timings = ? WHERE run_id = ?",
+            (datetime.now().isoformat(), total_found, json.dumps(timings) if timings else None, self.run_id)
+        )
+        self.connection.commit()
+
+    def resume(self, state, content_index=None) -> int:
+        """Replay runs that stopped without finishing into the saved progress.
+
+        Incremental and full runs newer than ``state.run_id`` that never
+        finished, e.g. because the process was killed, are applied to
+        ``state`` as if they had saved it; copied files are added to
+        ``content_index``. The next query then starts after the last
+        attachment they recorded. Returns the number of rows replayed.
+        """
+        rows = self.connection.execute("""
+            SELECT files.attachment_id, files.status, files.filename, files.dest, files.size, files.digest
+            FROM files JOIN runs USING (run_id)
+            WHERE runs.run_id > ? AND runs.finished IS NULL AND runs.mode IN ('incremental', 'full')
+                AND runs.dry_run = 0
+            ORDER BY files.run_id, files.attachment_id
+        """, (state.run_id,))
+        replayed = 0
+        for attachment_id, status, filename, dest, size, digest in rows:
+            state.record(attachment_id, None, found=status in PROCESSED_STATUSES,
+                         version=row_version(filename, size) if status == 'missing' else None)
+            if status == 'copied' and dest and content_index is not None:
+                content_index.add(dest, size, digest)
+            replayed += 1
+        if replayed:
+            logger.info(f"Resuming after {replayed} attachments from an interrupted run")
+        return replayed
+
+    def completed(self) -> Dict[int, str]:
+        """Get where each attachment was last copied, or found already extracted."""
+        rows = self.connection.execute(
+            "SELECT attachment_id, dest FROM latest_files WHERE status IN ('copied', 'exists') AND dest IS NOT NULL"
+        )
+        return dict(rows.fetchall())
+
+    def status_counts(self) -> Dict[str, int]:
+        """Count this run's attachments by outcome."""
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT status, COUNT(*) FROM files WHERE run_id = ? GROUP BY status", (self.run_id,)
+        )
+        return dict(rows.fetchall())
+
+    def skipped(self) -> Iterator[Dict[str, Any]]:
+        """Yield this run's skipped attachments, one at a time."""
+        self.flush()
+        placeholders = ", ".join("?" * len(SKIP_REASONS))
+        cursor = self.connection.execute(f"""
+            SELECT attachment_id, status, filename, source, detail, message_date FROM files
+            WHERE run_id = ? AND status IN ({placeholders})
+            ORDER BY attachment_id
+        """, (self.run_id, *SKIP_REASONS))
+        for attachment_id, status, filename, source, detail, message_date in cursor:
+            entry = {"attachment_id": attachment_id, "file": filename, "reason": SKIP_REASONS[status],
+                     "timestamp": message_date}
+            if source:
+                entry["path"] = source
+            if detail:
+                entry["error"] = detail
+            yield entry
+
+    def report(self) -> Dict[str, Any]:
+        """Get the skip counts and records, e.g. for an archive's manifest."""
+        counts = self.status_counts()
+        return {
+            "skipped_by_reason": {status: counts[status] for status in SKIP_REASONS if status in counts},
+            "skipped_files": list(self.skipped())
+        }
+
+    def write_summaries(self, output_dir: Path, summary: Dict[str, Any], timing_lines: List[str]):
+        """Write extraction_summary.json and .txt from this run's records.
+
+        Skipped files are streamed from the database into both files.
+        """
+        counts = self.status_counts()
+        skipped_by_reason = {status: counts[status] for status in SKIP_REASONS if status in counts}
+        skipped_total = sum(skipped_by_reason.values())
+
+        json_path = Path(output_dir) / "extraction_summary.json"
+        with open(json_path, 'w') as f:
+            f.write("{")
+            for key, value in {**summary, "skipped_by_reason": skipped_by_reason}.items():
+                value = json.dumps(value, indent=2).replace("\n", "\n  ")
+                f.write(f"\n  {json.dumps(key)}: {value},")
+            f.write('\n  "skipped_files": [')
+            for i, entry in enumerate(self.skipped()):
+                f.write(("," if i else "") + "\n    " + json.dumps(entry))
+            f.write("\n  ]\n}\n" if skipped_total else "]\n}\n")
+
+        text_path = Path(output_dir) / "extraction_summary.txt"
+        with open(text_path, 'w') as f:
+            f.write("PDF Extraction Summary\n")
+            f.write("===================\n\n")
+            f.write(f"Timestamp: {summary['timestamp']}\n")
+            f.write(f"Total PDFs found: {summary['total_pdfs_found']}\n")
+            f.write(f"Successfully copied: {summary['successfully_copied']}\n")
+            f.write(f"Duplicates not copied: {summary['deduplicated']}\n")
+            f.write(f"Already extracted: {counts.get('exists', 0)}\n")
+            f.write(f"Skipped files: {skipped_total}\n")
+            for status, count in skipped_by_reason.items():
+                f.write(f"  {status}: {count}\n")
+            if summary.get('filters'):
+                f.write(f"Filters: {json.dumps(summary['filters'])}\n")
+            f.write("\n")
+
+            f.write("Timings:\n")
+            f.write("\n".join(timing_lines) + "\n\n")
+
+            if skipped_total:
+                f.write("Skipped Files Details:\n")
+                f.write("=====================\n\n")
+                for entry in self.skipped():
+                    f.write(f"File: {entry['file']}\n")
+                    f.write(f"Reason: {entry['reason']}\n")
+                    f.write(f"Timestamp: {entry['timestamp']}\n")
+                    if 'error' in entry:
+                        f.write(f"Error: {entry['error']}\n")
+                    f.write("\n")
+            f.write(f"Per-file records: {MANIFEST_FILENAME} (run {self.run_id})\n")
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
+            if self.temporary:
+                for suffix in ("", "-wal", "-shm", "-journal"):
+                    try:
+                        os.unlink(str(self.path) + suffix)
+                    except OSError:
+                        pass
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import os
+import time
+import tempfile
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between rewrites of the textfile while a run is in progress
+DEFAULT_METRICS_INTERVAL = 15.0
+
+METRIC_PREFIX = "pdf_extract_"
+
+# (name without prefix, type, help, [(labels, value), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_metrics(families: List[MetricFamily]) -> str:
+    """Render metric families in the OpenMetrics text format."""
+    lines = []
+    for name, kind, help_text, samples in families:
+        name = METRIC_PREFIX + name
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in sorted(labels.items()))
+            sample = f"{name}{{{label_text}}}" if label_text else name
+            lines.append(f"{sample} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsTextfile:
+    """A .prom file for a textfile collector such as node_exporter's.
+
+    The file is replaced atomically so a scrape never sees a partial write.
+    ``due`` throttles the periodic rewrites made while a run is in progress.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_METRICS_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self._last_write: Optional[float] = None
+
+    def due(self) -> bool:
+        return self._last_write is None or time.monotonic() - self._last_write >= self.interval
+
+    def write(self, families: List[MetricFamily]):
+        """Write the metrics; failures are logged and never stop the run."""
+        self._last_write = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=f".{self.path.name}.", dir=self.path.parent)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(format_metrics(families))
+                # Collectors often run as another user
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {self.path}: {e}")
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+# Copying is I/O bound, so a few more threads than cores keeps the device busy
+DEFAULT_WORKERS = min(8, (os.cpu_count() or 1) + 2)
+
+
+def ordered_map(func: Callable[[Any], Any], items: Iterable[Any], workers: int = DEFAULT_WORKERS,
+                stop_callback: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """Run ``func`` over ``items`` on a bounded thread pool.
+
+    Yields ``(item, result, error)`` in input order, so callers can report
+    progress exactly as a sequential loop would. At most ``2 * workers``
+    items are in flight. Once ``stop_callback`` returns true no new items
+    are started; work already running is finished and yielded.
+    """
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def next_result():
+            item, future = pending.popleft()
+            try:
+                return item, future.result(), None
+            except Exception as e:
+                return item, None, e
+
+        for item in items:
+            if stop_callback and stop_callback():
+                break
+            pending.append((item, pool.submit(func, item)))
+            if len(pending) >= workers * 2:
+                yield next_result()
+
+        while pending:
+            if stop_callback and stop_callback():
+                # Queued items start in order, so the cancelled ones are a suffix
+                for _, future in pending:
+                    future.cancel()
+            if pending[0][1].cancelled():
+                pending.popleft()
+                continue
+            yield next_result()
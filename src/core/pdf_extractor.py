@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
 import os
-import sqlite3
-import shutil
 from datetime import datetime
 from pathlib import Path
 import logging
-import re
-from typing import Dict, Optional, List, Any
-import json
+from typing import Dict, Optional, List, Any, Iterator, Tuple
+import time
+import itertools
 from queue import Queue
 
+from core.archive import ArchiveWriter
+from core.attachments import AttachmentIndex
+from core.layout import DEFAULT_LAYOUT, OutputLayout
+from core.manifest import MANIFEST_FILENAME, ExtractionManifest
+from core.analysis_cache import AnalysisCache, library_key
+from core.chat_db import ChatDatabase
+from core.extraction_state import ExtractionState
+from core.dedup import ContentIndex
+from core.parallel import DEFAULT_WORKERS, ordered_map
+from core.validation import check_pdf
+from core.copy_strategies import copy_file
+from core.run_stats import RunStats
+from core.queries import PDFFilter, PDFQuery, apple_datetime, changed_ids, downloaded_ids, row_version
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -17,15 +29,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Rows per page for get_pdf_page
+PAGE_SIZE = 500
+
 class IMessagePDFExtractor:
-    def __init__(self, output_dir: str = "extracted_pdfs", skip_validation: bool = False, message_queue: Queue = None):
+    def __init__(self, output_dir: str = "extracted_pdfs", skip_validation: bool = False, message_queue: Queue = None,
+                 snapshot: bool = False, link_duplicates: bool = False, workers: int = DEFAULT_WORKERS,
+                 copy_mode: str = 'copy', structural_check: bool = False, library_root: Optional[str] = None,
+                 layout: str = DEFAULT_LAYOUT, dry_run: bool = False):
         self.output_dir = Path(output_dir)
+        # Resolve, check and deduplicate PDFs without writing anything
+        self.dry_run = dry_run
+        # Where each PDF goes under the output directory or in the archive
+        self.layout = OutputLayout(layout)
+        # Messages folder to read instead of ~/Library/Messages, e.g. a copy or a test fixture
+        self.library_root = Path(library_root).expanduser() if library_root else None
         self.skip_validation = skip_validation
+        # Also look for startxref/%%EOF in the tail to catch truncated files
+        self.structural_check = structural_check
+        self.link_duplicates = link_duplicates
+        self.workers = workers
+        # One of copy_strategies.COPY_MODES; unsupported fast paths fall back to a copy
+        self.copy_mode = copy_mode
         self.message_queue = message_queue
-        self.output_dir.mkdir(parents=True, exist_ok=True)
         self.chat_db_path = self._get_chat_db_path()
-        self.skipped_files: Dict[str, Dict] = {}
+        # Read-only connection shared by analysis and extraction
+        self.chat_db = ChatDatabase(self.chat_db_path, snapshot=snapshot)
+        # Built lazily on the first lookup, then shared by every call
+        self.attachment_index = AttachmentIndex(library_root=self.library_root)
+        # Per-stage timings of the last extract_pdfs run
+        self.stats = RunStats()
+        # Archive that extract_pdfs is writing to, if any
+        self._archive: Optional[ArchiveWriter] = None
+        # Filter options of the last extract_pdfs run, empty when unfiltered
+        self.filters: Dict[str, Any] = {}
+        # Per-attachment records of the running extract_pdfs call
+        self.manifest: Optional[ExtractionManifest] = None
+        # Progress and content index kept by extract_pdfs(reuse=True) for the next call
+        self._kept: Optional[Tuple[ExtractionState, ContentIndex]] = None
         
+    def close(self):
+        """Release the chat.db connection and any snapshot copy."""
+        self.chat_db.close()
+
     def _log(self, message, level='info'):
         """Log message to both GUI and file."""
         if self.message_queue:
@@ -48,6 +94,13 @@ class IMessagePDFExtractor:
 
     def _get_chat_db_path(self) -> Path:
         """Get the path to the iMessage chat database."""
+        if self.library_root:
+            chat_db = self.library_root / "chat.db"
+            if not chat_db.exists():
+                raise FileNotFoundError(f"No chat.db found in {self.library_root}")
+            self._log(f"Found chat database at: {chat_db}")
+            return chat_db
+        
         home = Path.home()
         # Try both possible locations for the chat.db file
         possible_paths = [
@@ -63,229 +116,516 @@ class IMessagePDFExtractor:
                 
         raise FileNotFoundError("iMessage database not found. Please ensure Messages is properly set up and synced.")
 
-    def _sanitize_filename(self, filename: str) -> str:
-        """Sanitize the filename to be safe for all filesystems."""
-        # Split filename and extension
-        name, ext = os.path.splitext(filename)
-        # Remove any path separators and null bytes
-        name = re.sub(r'[/\\\\:\*\?"<>\|\x00]', '_', name)
-        # Remove any leading/trailing spaces and dots
-        name = name.strip('. ')
-        # Ensure filename isn't empty
-        if not name:
-            name = 'unnamed_pdf'
-        return f"{name}{ext}"
-
-    def _is_valid_pdf(self, file_path: Path) -> bool:
-        """Basic validation that file appears to be a PDF."""
+    def _validate_pdf(self, file_path: Path, st: Optional[os.stat_result] = None) -> Optional[str]:
+        """Get the reason a file is not a usable PDF, or None if it looks fine."""
         if self.skip_validation:
-            return True
+            return None
             
         try:
-            if not file_path.exists() or not file_path.is_file():
-                return False
-            
-            # Check file size (must be between 100 bytes and 2GB)
-            size = file_path.stat().st_size
-            if size < 100 or size > 2_000_000_000:
-                return False
-            
-            # Check PDF magic number
-            with open(file_path, 'rb') as f:
-                header = f.read(4)
-                return header.startswith(b'%PDF')
-                
+            return check_pdf(file_path, structural=self.structural_check, st=st)
         except Exception as e:
             self._log(f"Error validating PDF {file_path}: {e}", level='warning')
-            return False
+            return 'unreadable'
+
+    def _get_attachment_path(self, attachment_id: str,
+                             filename: Optional[str] = None) -> Optional[Tuple[Path, os.stat_result]]:
+        """Get the full path and stat of an attachment from its chat.db filename."""
+        found = self.attachment_index.resolve(filename)
+        if found:
+            self._log(f"Found PDF at: {found[0]}")
+            return found
 
-    def _get_attachment_path(self, attachment_id: str) -> Optional[Path]:
-        """Get the full path of an attachment from its ID."""
-        home = Path.home()
-        # Try both possible locations for attachments
-        base_paths = [
-            home / "Library/Messages/Attachments",
-            home / "Library/Containers/com.apple.iChat/Data/Library/Messages/Attachments"
-        ]
-        
-        for base_path in base_paths:
-            if not base_path.exists():
-                continue
-                
-            try:
-                # Search for the attachment using its ID
-                for root, _, files in os.walk(base_path):
-                    root_path = Path(root)
-                    if attachment_id in root_path.name:
-                        # Found the directory containing the attachment
-                        pdf_files = list(root_path.glob("*.pdf"))
-                        if pdf_files:
-                            self._log(f"Found PDF at: {pdf_files[0]}")
-                            return pdf_files[0]
-            except Exception as e:
-                self._log(f"Error searching in {base_path}: {e}", level='warning')
-                continue
-        
         self._log(f"Could not find attachment with ID: {attachment_id}", level='warning')
         return None
 
+    def _summary(self) -> Dict[str, Any]:
+        """Get the run's results for the JSON summary or an archive manifest."""
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "total_pdfs_found": self.total_found,
+            "successfully_copied": self.successful_copies,
+            "deduplicated": self.deduplicated,
+            "filters": self.filters,
+            "timings": self.stats.to_dict()
+        }
+
     def _save_summary(self):
-        """Save a detailed summary of the extraction process."""
-        summary_file = self.output_dir / "extraction_summary.json"
-        with open(summary_file, 'w') as f:
-            json.dump({
-                "timestamp": datetime.now().isoformat(),
-                "total_pdfs_found": self.total_found,
-                "successfully_copied": self.successful_copies,
-                "skipped_files": self.skipped_files
-            }, f, indent=2)
+        """Save a detailed summary of the extraction process, built from the manifest."""
+        self.manifest.write_summaries(self.output_dir, self._summary(), self.stats.summary_lines())
+
+    def _extract_one(self, row, content_index: ContentIndex) -> Dict[str, Any]:
+        """Resolve, validate and copy one attachment; runs on a copy worker."""
+        if not row.downloaded:
+            # Only in iCloud or still arriving; no point looking on disk
+            return {'status': 'not_downloaded'}
+
+        # The destination comes from chat.db alone, and whether it is taken
+        # from the listing made at the start of the run
+        rel_path = self.layout.path_for(row.attachment_id, row.filename, apple_datetime(row.date),
+                                        row.sender, row.chat)
+        if not self.layout.claim(rel_path):
+            return {'status': 'exists', 'name': rel_path}
+        result = None
+        try:
+            result = self._extract_to(row, rel_path, content_index)
+            return result
+        finally:
+            if result is None or result['status'] not in ('copied', 'archive'):
+                self.layout.release(rel_path)
+
+    def _extract_to(self, row, rel_path: str, content_index: ContentIndex) -> Dict[str, Any]:
+        attachment_id, filename = row.attachment_id, row.filename
+        with self.stats.time('resolve'):
+            found = self._get_attachment_path(str(attachment_id), filename)
+        if not found:
+            return {'status': 'missing'}
+
+        # Validate the source before writing anything; the resolver's stat
+        # serves the size check, the validator and the duplicate check
+        source_path, source_stat = found
+        dest_path = self.output_dir / rel_path
+        with self.stats.time('validate'):
+            if row.size and source_stat.st_size < row.size:
+                # Shorter than chat.db says: a partial download, not worth reading
+                return {'status': 'truncated', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size,
+                        'detail': f"{source_stat.st_size} of {row.size} bytes on disk"}
+            problem = self._validate_pdf(source_path, st=source_stat)
+        if problem:
+            return {'status': 'invalid', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size,
+                    'detail': problem}
+
+        # Don't copy content that was already extracted under another name
+        with self.stats.time('dedup'):
+            duplicate = content_index.claim(source_path, source_stat.st_size, dest_path)
+        if duplicate:
+            if not self.dry_run and not self._archive:
+                self.layout.make_parent(self.output_dir, rel_path)
+                content_index.link_or_alias(dest_path, duplicate, hardlink=self.link_duplicates)
+            return {'status': 'duplicate', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size,
+                    'original': duplicate, 'digest': content_index.known_digest(duplicate)}
+
+        if self.dry_run:
+            return {'status': 'would_copy', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size}
+        if self._archive:
+            # Written in order by the extraction thread, see extract_pdfs
+            return {'status': 'archive', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size,
+                    'digest': content_index.known_digest(rel_path)}
+
+        self.layout.make_parent(self.output_dir, rel_path)
+        try:
+            # Copy the file
+            with self.stats.time('copy', source_stat.st_size):
+                copy_file(source_path, dest_path, self.copy_mode)
+        except Exception as e:
+            content_index.release(dest_path)
+            return {'status': 'copy_failed', 'name': rel_path, 'path': source_path, 'detail': e}
+
+        content_index.commit(dest_path)
+        return {'status': 'copied', 'name': rel_path, 'path': source_path, 'size': source_stat.st_size,
+                'digest': content_index.known_digest(rel_path)}
+
+    def _timed_extract_one(self, row, content_index: ContentIndex) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = self._extract_one(row, content_index)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stats.add_latency(elapsed)
+        result['seconds'] = elapsed
+        return result
+
+    def _resume(self, state: ExtractionState, content_index: ContentIndex) -> int:
+        """Continue after an interrupted run recorded in the output directory's manifest."""
+        if not self.dry_run:
+            return self.manifest.resume(state, content_index)
+        if not (self.output_dir / MANIFEST_FILENAME).exists():
+            return 0
+        # Preview what the real run would do, without recording anything
+        journal = ExtractionManifest.open(self.output_dir)
+        try:
+            return journal.resume(state, content_index)
+        finally:
+            journal.close()
+
+    # Called as extract_pdfs goes, e.g. to publish metrics; they do nothing here
+    def _run_started(self, state: ExtractionState):
+        pass
+
+    def _row_handled(self, state: ExtractionState):
+        pass
+
+    def _run_finished(self, state: ExtractionState):
+        pass
+
+    def extract_pdfs(self, stop_callback=None, full: bool = False, filters: Optional[PDFFilter] = None,
+                     archive: Optional[str] = None, reuse: bool = False):
+        """Extract PDFs from iMessage attachments.
+
+        Only attachments added since the previous run into the same output
+        directory are processed, unless ``full`` is set. A run restricted by
+        ``filters`` covers every matching PDF and leaves the saved progress
+        alone, since it skips attachments outside the filter.
+
+        With ``archive``, a .zip or .tar path, the PDFs are streamed into
+        that file with a manifest instead of being copied into the output
+        directory. Such a run always covers every matching PDF as well.
+
+        Every attachment's outcome is recorded in the output directory's
+        manifest database, which the summaries are generated from. It is also
+        the journal of finished work: when an incremental run was killed part
+        way, the next one continues after the last attachment it recorded.
+
+        A dry run goes through the same steps but writes nothing; its
+        records are kept in a temporary manifest. An incremental run that
+        finds nothing new writes nothing either.
+
+        With ``reuse``, an incremental run keeps the listing of the output
+        directory, the content index and the progress in memory, and the
+        next such call starts from them instead of reading the directory
+        again. Only use it while nothing else writes to the output directory,
+        as in watch mode.
+        """
+        filtered = filters is not None and not filters.is_empty()
+        # Progress and the content index belong to the output directory
+        standalone = filtered or archive is not None
+        mode = 'filtered' if filtered else 'full' if full or archive else 'incremental'
+        reuse = reuse and mode == 'incremental' and not self.dry_run
+        kept, self._kept = self._kept if reuse else None, None
+        if not (self.dry_run or archive):
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.total_found = 0
+        self.successful_copies = 0
+        self.deduplicated = 0
+        self.stats = RunStats()
+        self.filters = filters.describe() if filtered else {}
+        # Dry runs and archives leave the output directory alone, so their records are temporary
+        if self.dry_run or archive:
+            self.manifest = ExtractionManifest.temporary_file()
+        else:
+            self.manifest = ExtractionManifest.open(self.output_dir)
+        replayed = 0
+        if kept:
+            # The previous call left the layout's listing as it is on disk
+            state, content_index = kept
+        else:
+            # One listing of the output directory instead of a stat per PDF
+            with self.stats.time('scan'):
+                self.layout.scan(None if archive else self.output_dir, remove_partial=not self.dry_run)
+            content_index = ContentIndex(self.output_dir) if archive else ContentIndex.load(self.output_dir)
+            state = ExtractionState(self.output_dir) if full or standalone else ExtractionState.load(self.output_dir)
+            if not (full or standalone):
+                replayed = self._resume(state, content_index)
+        query = PDFQuery(filters)
+        if filtered:
+            self._log(f"Only extracting PDFs matching {self.filters}")
+        else:
+            # Attachments still in iCloud stay pending without being queried
+            # again, and missing files are only looked for once their row changes
+            cursor = self.chat_db.connection.cursor()
+            try:
+                retry = downloaded_ids(cursor, state.pending_ids) | changed_ids(cursor, state.missing)
+            finally:
+                cursor.close()
+            condition, params = state.predicate(retry)
+            query.where(condition, *params)
         
-        # Also create a human-readable summary
-        readable_summary = self.output_dir / "extraction_summary.txt"
-        with open(readable_summary, 'w') as f:
-            f.write(f"PDF Extraction Summary\n")
-            f.write(f"===================\n\n")
-            f.write(f"Timestamp: {datetime.now()}\n")
-            f.write(f"Total PDFs found: {self.total_found}\n")
-            f.write(f"Successfully copied: {self.successful_copies}\n")
-            f.write(f"Skipped files: {len(self.skipped_files)}\n\n")
-            
-            if self.skipped_files:
-                f.write("Skipped Files Details:\n")
-                f.write("=====================\n\n")
-                for filename, details in self.skipped_files.items():
-                    f.write(f"File: {filename}\n")
-                    f.write(f"Reason: {details['reason']}\n")
-                    f.write(f"Timestamp: {details['timestamp']}\n")
-                    if 'error' in details:
-                        f.write(f"Error: {details['error']}\n")
-                    f.write("\n")
-
-    def extract_pdfs(self, stop_callback=None):
-        """Extract PDFs from iMessage attachments."""
         try:
-            conn = sqlite3.connect(self.chat_db_path)
-            cursor = conn.cursor()
+            cursor = self.chat_db.connection.cursor()
             
-            # Get total number of PDFs
-            cursor.execute("""
-                SELECT COUNT(*) FROM attachment 
-                WHERE mime_type = 'application/pdf'
-            """)
-            total_pdfs = cursor.fetchone()[0]
+            # Query for PDF attachments in ROWID order, so the saved mark
+            # stays correct when the user stops part way through. Every row
+            # carries the total, so no separate COUNT pass is needed.
+            with self.stats.time('query'):
+                query.execute(cursor, order='rowid', with_total=True)
+            rows = self.stats.timed_rows(cursor)
+            first = next(rows, None)
+            total_pdfs = first.total if first else 0
+            self.total_found = total_pdfs
             self._log(f"Found {total_pdfs} PDFs to extract")
+            if first is None and mode == 'incremental' and not replayed:
+                # Nothing new: the saved progress, index and summaries still hold
+                self._run_finished(state)
+                if reuse:
+                    self._kept = (state, content_index)
+                return
+
+            self.manifest.start_run(mode=mode, dry_run=self.dry_run, filters=self.filters)
+            if archive and not self.dry_run:
+                self._archive = ArchiveWriter(archive)
+            self._run_started(state)
             
-            # Query for PDF attachments
-            cursor.execute("""
-                SELECT ROWID, filename 
-                FROM attachment 
-                WHERE mime_type = 'application/pdf'
-            """)
-            
+            # The cursor is consumed lazily; the pool only reads ahead a few rows
             processed = 0
-            for attachment_id, filename in cursor.fetchall():
-                if stop_callback and stop_callback():
-                    self._log("Extraction stopped by user")
-                    break
-                    
+            for row, result, error in ordered_map(
+                lambda row: self._timed_extract_one(row, content_index),
+                itertools.chain([first], rows) if first else [],
+                workers=self.workers, stop_callback=stop_callback
+            ):
+                attachment_id, filename, date = row.attachment_id, row.filename, row.date
                 processed += 1
                 percent = int((processed / total_pdfs) * 100)
                 
-                try:
-                    source_path = self._get_attachment_path(str(attachment_id))
-                    if not source_path:
-                        self._log(f"Could not find attachment {attachment_id}", level='warning')
-                        continue
-
-                    # Sanitize filename and create destination path
-                    safe_filename = self._sanitize_filename(filename or f"pdf_{attachment_id}.pdf")
-                    dest_path = self.output_dir / safe_filename
-
-                    # Skip if file exists
-                    if dest_path.exists():
-                        self._log(f"Skipping {safe_filename} - already exists")
-                        continue
+                if error:
+                    self._log(f"Error processing {filename}: {str(error)}", level='error')
+                    self.manifest.record(attachment_id, 'error', filename=filename, size=row.size, detail=error,
+                                         message_date=apple_datetime(date))
+                    # Retry on the next run rather than losing it below the mark
+                    state.record(attachment_id, date, found=False)
+                    self._row_handled(state)
+                    continue
 
-                    # Copy the file
-                    shutil.copy2(source_path, dest_path)
-                    
-                    # Validate PDF if needed
-                    if not self.skip_validation and not self._is_valid_pdf(dest_path):
-                        self._log(f"Invalid PDF: {safe_filename}", level='warning')
-                        self.skipped_files[str(dest_path)] = {
-                            'reason': 'invalid_pdf',
-                            'original_name': filename,
-                            'attachment_id': attachment_id
-                        }
-                        dest_path.unlink()  # Remove invalid file
-                        continue
+                status = result['status']
+                safe_filename = result.get('name')
+                self.manifest.record(
+                    attachment_id, status, filename=filename, source=result.get('path'), dest=safe_filename,
+                    size=result.get('size', row.size), digest=result.get('digest'), detail=result.get('detail'),
+                    message_date=apple_datetime(date), seconds=result.get('seconds')
+                )
+                if status in ('not_downloaded', 'missing', 'truncated', 'copy_failed'):
+                    if status == 'not_downloaded':
+                        self._log(f"Not downloaded to this Mac yet: {filename}", level='warning')
+                    elif status == 'missing':
+                        self._log(f"Could not find attachment {attachment_id}", level='warning')
+                    elif status == 'truncated':
+                        self._log(f"Partially downloaded PDF: {safe_filename}", level='warning')
+                    else:
+                        self._log(f"Failed to copy {filename}: {result['detail']}", level='error')
+                    # Retried on the next run, e.g. once the download has finished
+                    state.record(attachment_id, date, found=False,
+                                 version=row_version(filename, row.size) if status == 'missing' else None)
+                    self._row_handled(state)
+                    continue
 
+                state.record(attachment_id, date)
+                if status == 'exists':
+                    self._log(f"Skipping {safe_filename} - already exists")
+                elif status == 'duplicate':
+                    self.deduplicated += 1
+                    if self._archive:
+                        self._archive.add_duplicate(result['original'], attachment_id=attachment_id,
+                                                    original_name=safe_filename)
+                    self._log(f"Skipping {safe_filename} - same content as {result['original']}")
+                elif status == 'invalid':
+                    self._log(f"Invalid PDF: {safe_filename}", level='warning')
+                elif status == 'would_copy':
+                    self._log(f"Would copy: {safe_filename}")
+                else:
+                    if status == 'archive':
+                        # One thread appends, so the archive is written sequentially
+                        with self.stats.time('copy', result['size']):
+                            safe_filename = self._archive.add_file(
+                                result['path'], safe_filename, mtime=apple_datetime(date).timestamp(),
+                                key=result['name'], attachment_id=attachment_id,
+                                original_name=os.path.basename(filename) if filename else None,
+                                date=apple_datetime(date).isoformat(), sender=row.sender
+                            )
+                    self.successful_copies += 1
                     self._update_progress(
                         f"Extracted {processed}/{total_pdfs}: {safe_filename}",
                         percent=percent
                     )
+                self._row_handled(state)
 
-                except Exception as e:
-                    self._log(f"Error processing {filename}: {str(e)}", level='error')
-                    continue
+            if stop_callback and stop_callback():
+                self._log("Extraction stopped by user")
 
-            self._save_summary()
+            self.manifest.finish_run(self.total_found, self.stats.to_dict())
+            if self._archive:
+                # A stopped run still gets a valid archive of what was done
+                with self.stats.time('summary'):
+                    self._archive.close({**self._summary(), **self.manifest.report()})
+                self._archive = None
+                self._log(f"Archive saved to {archive}")
+            elif not self.dry_run:
+                with self.stats.time('summary'):
+                    if not standalone:
+                        state.run_id = self.manifest.run_id
+                        state.save()
+                    content_index.save()
+                self._save_summary()
+            self._run_finished(state)
+            if reuse:
+                self._kept = (state, content_index)
             self._log("Extraction complete!")
             
         except Exception as e:
             self._log(f"Error during extraction: {str(e)}", level='error')
             raise
         finally:
-            if 'conn' in locals():
-                conn.close() 
+            if 'cursor' in locals():
+                cursor.close()
+            if self._archive:
+                # Only reached when the run failed part way
+                self._archive.abort()
+                self._archive = None
+            self.manifest.close()
+            self.manifest = None
+
+    def _pdf_record(self, row, resolve: bool = True) -> Dict[str, Any]:
+        """Build a PDF record from a query row, resolving its path.
 
-    def get_pdf_list(self) -> List[Dict[str, Any]]:
-        """Get a list of all PDFs in the Messages database."""
+        Without ``resolve`` the file is not looked up: ``path`` and
+        ``exists`` stay None until ``resolve_pdf`` is called for the record.
+        """
+        attachment_id, filename = row.attachment_id, row.filename
+        
+        record = {
+            'id': attachment_id,
+            'filename': os.path.basename(filename) if filename else f"pdf_{attachment_id}.pdf",
+            'size': row.size,
+            'date': apple_datetime(row.date).isoformat(),
+            'sender': row.sender,
+            'chat': row.chat,
+            # Path as recorded in chat.db, used to resolve the record later
+            'source': filename,
+            # False when chat.db says the file isn't on this Mac
+            'downloaded': row.downloaded,
+            'path': None,
+            'exists': None if row.downloaded else False
+        }
+        if resolve and row.downloaded:
+            path = self.resolve_pdf(record)
+            record['path'] = str(path) if path else None
+            record['exists'] = path is not None
+        return record
+
+    def resolve_pdf(self, pdf: Dict[str, Any]) -> Optional[Path]:
+        """Find the file for a record, or None if it isn't on disk."""
+        if not pdf.get('downloaded', True):
+            return None
+        found = self._get_attachment_path(str(pdf['id']), pdf['source'])
+        return found[0] if found else None
+
+    def _query_pdfs(self, cursor, after: Optional[Tuple[int, int]] = None, limit: Optional[int] = None,
+                    newer_than: Optional[int] = None, filters: Optional[PDFFilter] = None):
+        """Run the PDF listing query, newest first, optionally from a keyset position."""
+        query = PDFQuery(filters)
+        if after is not None:
+            # Resume strictly after the last (date, ROWID) already seen
+            query.after(after)
+        if newer_than is not None:
+            query.newer_than(newer_than)
+        query.execute(cursor, order='date', limit=limit)
+
+    def iter_pdfs(self, batch_size: Optional[int] = None, filters: Optional[PDFFilter] = None) -> Iterator[Any]:
+        """Yield the PDFs in the Messages database, newest first, as they are read.
+
+        Rows are pulled from the cursor lazily, so the first record is
+        available immediately and memory stays flat. With ``batch_size``,
+        lists of up to that many records are yielded instead.
+        """
+        cursor = self.chat_db.connection.cursor()
         try:
-            conn = sqlite3.connect(self.chat_db_path)
-            cursor = conn.cursor()
-            
             # Query for PDF attachments with message info
-            cursor.execute("""
-                SELECT 
-                    attachment.ROWID as attachment_id,
-                    attachment.filename,
-                    attachment.total_bytes,
-                    message.date,
-                    handle.id as sender
-                FROM attachment
-                JOIN message_attachment_join ON attachment.ROWID = message_attachment_join.attachment_id
-                JOIN message ON message.ROWID = message_attachment_join.message_id
-                LEFT JOIN handle ON message.handle_id = handle.ROWID
-                WHERE attachment.mime_type = 'application/pdf'
-                ORDER BY message.date DESC
-            """)
-            
-            pdfs = []
-            for row in cursor.fetchall():
-                attachment_id, filename, size, date, sender = row
-                
-                # Convert date from nanoseconds to datetime
-                date = datetime.fromtimestamp(date/1e9)
-                
-                # Get attachment path
-                path = self._get_attachment_path(str(attachment_id))
-                
-                pdfs.append({
-                    'id': attachment_id,
-                    'filename': filename or f"pdf_{attachment_id}.pdf",
-                    'size': size,
-                    'date': date.isoformat(),
-                    'sender': sender,
-                    'path': str(path) if path else None,
-                    'exists': path is not None and path.exists()
-                })
-            
-            return pdfs
+            self._query_pdfs(cursor, filters=filters)
             
+            if batch_size:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [self._pdf_record(row) for row in rows]
+            else:
+                for row in cursor:
+                    yield self._pdf_record(row)
+                    
+        except Exception as e:
+            self._log(f"Error analyzing PDFs: {str(e)}", level='error')
+            raise
+        finally:
+            cursor.close()
+
+    def get_pdf_page(self, after: Optional[Tuple[int, int]] = None, limit: int = PAGE_SIZE, resolve: bool = True,
+                     filters: Optional[PDFFilter] = None) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """Get one page of PDFs, newest first, using keyset pagination.
+
+        ``after`` is the key returned with the previous page. Returns the
+        records and the key for the next page, which is None after the last.
+        With ``resolve=False`` only chat.db is read; see ``_pdf_record``.
+        """
+        cursor = self.chat_db.connection.cursor()
+        try:
+            self._query_pdfs(cursor, after=after, limit=limit, filters=filters)
+            rows = cursor.fetchall()
         except Exception as e:
             self._log(f"Error analyzing PDFs: {str(e)}", level='error')
             raise
         finally:
-            if 'conn' in locals():
-                conn.close() 
\ No newline at end of file
+            cursor.close()
+
+        next_key = (rows[-1].date, rows[-1].attachment_id) if len(rows) == limit else None
+        return [self._pdf_record(row, resolve) for row in rows], next_key
+
+    def _count_pdfs(self) -> int:
+        cursor = self.chat_db.connection.cursor()
+        try:
+            return PDFQuery().count(cursor)
+        finally:
+            cursor.close()
+
+    def analysis_key(self) -> Dict[str, Any]:
+        """Get the library key for the analysis cache; take it before reading."""
+        return library_key(self.chat_db_path, self.attachment_index.base_paths)
+
+    def get_cached_pdf_list(self, cache: AnalysisCache, key: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Bring a cached analysis up to date, or return None if it can't be reused.
+
+        With an unchanged key the cached records are returned as they are.
+        Otherwise only attachments newer than the cached ones are queried,
+        unresolved, and records whose file may have changed get ``exists``
+        reset to None. Records that weren't downloaded are re-checked in
+        chat.db, which is where a finished download shows up. A PDF count that doesn't add up, e.g. after messages
+        were deleted, means a full scan is needed.
+        """
+        if cache.records is None:
+            return None
+        if cache.key == key:
+            return cache.records
+
+        offloaded = [pdf for pdf in cache.records if pdf['downloaded'] is False]
+        cursor = self.chat_db.connection.cursor()
+        try:
+            self._query_pdfs(cursor, newer_than=cache.max_id)
+            newer = [self._pdf_record(row, resolve=False) for row in cursor]
+            arrived = downloaded_ids(cursor, [pdf['id'] for pdf in offloaded])
+        finally:
+            cursor.close()
+        if self._count_pdfs() != len(cache.records) + len(newer):
+            self._log("Messages library changed; rebuilding the analysis")
+            return None
+
+        for pdf in offloaded:
+            pdf['downloaded'] = pdf['id'] in arrived
+        roots_changed = cache.key.get("roots") != key["roots"]
+        for pdf in cache.records:
+            if not pdf['downloaded']:
+                continue
+            # Missing files may have been downloaded since
+            if roots_changed or not pdf['exists']:
+                pdf['path'] = None
+                pdf['exists'] = None
+        self._log(f"Reusing cached analysis with {len(newer)} new PDFs")
+        return sorted(newer + cache.records, key=lambda pdf: (pdf['date'], pdf['id']), reverse=True)
+
+    def get_pdf_list(self, cache: Optional[AnalysisCache] = None,
+                     filters: Optional[PDFFilter] = None) -> List[Dict[str, Any]]:
+        """Get a list of all PDFs in the Messages database.
+
+        With a ``cache``, the previous analysis is reused where it is still
+        valid and the cache is updated with the result. The cache holds the
+        whole library, so filtered lists always come from the database.
+        """
+        if cache is None or (filters is not None and not filters.is_empty()):
+            return list(self.iter_pdfs(filters=filters))
+
+        key = self.analysis_key()
+        pdfs = self.get_cached_pdf_list(cache, key)
+        if pdfs is None:
+            pdfs = list(self.iter_pdfs())
+        for pdf in pdfs:
+            if pdf['exists'] is None:
+                path = self.resolve_pdf(pdf)
+                pdf['path'] = str(path) if path else None
+                pdf['exists'] = path is not None
+        cache.save(key, pdfs)
+        return pdfs
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+import json
+import sqlite3
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Seconds between the Unix epoch and Apple's, 2001-01-01
+APPLE_EPOCH_OFFSET = 978307200
+
+# Window functions need SQLite 3.25; older builds count in a second query
+HAS_WINDOW_FUNCTIONS = sqlite3.sqlite_version_info >= (3, 25, 0)
+
+# An attachment is a PDF if any of its metadata says so. Messages fills in
+# the mime type and UTI inconsistently, so the extension is checked too;
+# LIKE is case-insensitive for ASCII.
+PDF_CONDITION = """(
+    attachment.mime_type = 'application/pdf' COLLATE NOCASE
+    OR attachment.uti = 'com.adobe.pdf'
+    OR attachment.filename LIKE '%.pdf'
+    OR attachment.transfer_name LIKE '%.pdf'
+)"""
+
+# attachment.transfer_state once the whole file is on this Mac. Other values
+# mean it was never downloaded, was offloaded to iCloud or is still arriving.
+TRANSFER_FINISHED = 5
+
+# True when chat.db says the file should be on disk; libraries too old to
+# have a transfer state are assumed to be local
+DOWNLOADED_CONDITION = f"(attachment.transfer_state IS NULL OR attachment.transfer_state = {TRANSFER_FINISHED})"
+
+# Host parameters per statement stay well below SQLite's older 999 limit
+MAX_IN_PARAMS = 500
+
+# Every PDF query returns these columns; ``total`` is the number of matching
+# rows when the query was run with ``with_total``, otherwise None
+PDFRow = namedtuple('PDFRow', 'attachment_id filename size date sender chat downloaded total')
+
+ORDER_BY = {
+    # Newest first, for listing
+    'date': "message.date DESC, attachment.ROWID DESC",
+    # Oldest attachment first, so a saved ROWID mark is valid at any point
+    'rowid': "attachment.ROWID"
+}
+
+
+def apple_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Convert a chat.db timestamp to a local datetime.
+
+    Dates count from 2001-01-01; macOS 10.13 and later store nanoseconds,
+    older versions seconds.
+    """
+    if value is None:
+        return None
+    seconds = value / 1e9 if abs(value) > 1e11 else value
+    return datetime.fromtimestamp(seconds + APPLE_EPOCH_OFFSET)
+
+
+def to_apple_time(value: datetime) -> int:
+    """Convert a local datetime to chat.db's nanoseconds since 2001."""
+    return int((value.timestamp() - APPLE_EPOCH_OFFSET) * 1e9)
+
+
+class PDFFilter:
+    """Restricts which PDFs are listed or extracted.
+
+    Dates are local calendar days and both ends are inclusive. Senders and
+    chats are exact handle IDs (phone number or email) and chat identifiers;
+    ``name`` is a case-insensitive glob on the attachment's file name. Each
+    option becomes a parameterized condition that chat.db's indexes on
+    message date, handle and chat can serve.
+    """
+
+    def __init__(self, since: Optional[date] = None, until: Optional[date] = None,
+                 senders: Iterable[str] = (), chats: Iterable[str] = (),
+                 min_size: Optional[int] = None, max_size: Optional[int] = None, name: Optional[str] = None):
+        self.since = since
+        self.until = until
+        self.senders = [s for s in senders if s]
+        self.chats = [c for c in chats if c]
+        self.min_size = min_size
+        self.max_size = max_size
+        self.name = name or None
+
+    def is_empty(self) -> bool:
+        return not (self.since or self.until or self.senders or self.chats
+                    or self.min_size is not None or self.max_size is not None or self.name)
+
+    def apply(self, query: "PDFQuery") -> "PDFQuery":
+        """Add this filter's conditions to a query."""
+        if self.since:
+            start = datetime.combine(self.since, datetime.min.time())
+            query.where("message.date >= ?", to_apple_time(start))
+        if self.until:
+            end = datetime.combine(self.until + timedelta(days=1), datetime.min.time())
+            query.where("message.date < ?", to_apple_time(end))
+        if self.senders:
+            # Lets SQLite drive the join from the (handle_id, date) index
+            placeholders = ", ".join("?" * len(self.senders))
+            query.where(f"message.handle_id IN (SELECT ROWID FROM handle WHERE id IN ({placeholders}))",
+                        *self.senders)
+        if self.chats:
+            placeholders = ", ".join("?" * len(self.chats))
+            query.where(f"""message.ROWID IN (
+                SELECT message_id FROM chat_message_join WHERE chat_id IN (
+                    SELECT ROWID FROM chat WHERE chat_identifier IN ({placeholders})))""", *self.chats)
+        if self.min_size is not None:
+            query.where("attachment.total_bytes >= ?", self.min_size)
+        if self.max_size is not None:
+            query.where("attachment.total_bytes <= ?", self.max_size)
+        if self.name:
+            query.where("lower(COALESCE(attachment.transfer_name, attachment.filename)) GLOB ?", self.name.lower())
+        return query
+
+    def describe(self) -> Dict[str, Any]:
+        """Get the active options, for logs and summaries."""
+        options = {
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+            "senders": self.senders,
+            "chats": self.chats,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "name": self.name
+        }
+        return {key: value for key, value in options.items() if value not in (None, [])}
+
+
+class PDFQuery:
+    """Builds the one query that finds PDF attachments, for every caller.
+
+    A row joins the attachment to its message and sender handle in a single
+    pass; the chat comes from a correlated subquery, so a message in several
+    chats still yields one row per attachment. Callers add conditions with
+    ``where``. Extraction asks for the total number of matching rows, which
+    then comes back on every row from a window function; listings don't,
+    since the window makes SQLite build and sort the whole result before
+    returning the first row.
+    """
+
+    def __init__(self, filters: Optional[PDFFilter] = None):
+        self.conditions: List[str] = [PDF_CONDITION]
+        self.params: List[Any] = []
+        # Set once the query is bounded by attachment ROWID
+        self._by_rowid = False
+        if filters:
+            filters.apply(self)
+
+    def where(self, condition: str, *params) -> "PDFQuery":
+        """Add a parameterized condition, ANDed with the others."""
+        self.conditions.append(f"({condition})")
+        self.params.extend(params)
+        return self
+
+    def after(self, key: Tuple[int, int]) -> "PDFQuery":
+        """Continue after the (date, ROWID) key of the last row seen, in date order.
+
+        The leading ``message.date <= ?`` lets SQLite start the page with a
+        range seek on message_idx_date instead of scanning from the newest row.
+        """
+        date, rowid = key
+        return self.where("message.date <= ? AND (message.date < ? OR attachment.ROWID < ?)", date, date, rowid)
+
+    def newer_than(self, rowid: int) -> "PDFQuery":
+        self._by_rowid = True
+        return self.where("attachment.ROWID > ?", rowid)
+
+    def _from_where(self, order: str = 'rowid') -> str:
+        if order == 'date' and not self._by_rowid:
+            # Walk message_idx_date newest first, so rows come back in order
+            # without sorting the whole result; CROSS JOIN fixes the join
+            # order, which SQLite otherwise drives from message_attachment_join
+            tables = """
+            FROM message
+            CROSS JOIN message_attachment_join ON message_attachment_join.message_id = message.ROWID
+            CROSS JOIN attachment ON attachment.ROWID = message_attachment_join.attachment_id"""
+        else:
+            tables = """
+            FROM attachment
+            JOIN message_attachment_join ON message_attachment_join.attachment_id = attachment.ROWID
+            JOIN message ON message.ROWID = message_attachment_join.message_id"""
+        return f"""{tables}
+            LEFT JOIN handle ON handle.ROWID = message.handle_id
+            WHERE {' AND '.join(self.conditions)}
+        """
+
+    def select_sql(self, order: str = 'date', limit: Optional[int] = None,
+                   with_total: bool = False) -> Tuple[str, List[Any]]:
+        total = "COUNT(*) OVER ()" if with_total and HAS_WINDOW_FUNCTIONS else "NULL"
+        sql = f"""
+            SELECT
+                attachment.ROWID,
+                attachment.filename,
+                attachment.total_bytes,
+                message.date,
+                handle.id,
+                (SELECT chat.chat_identifier FROM chat_message_join
+                    JOIN chat ON chat.ROWID = chat_message_join.chat_id
+                    WHERE chat_message_join.message_id = message.ROWID LIMIT 1),
+                {DOWNLOADED_CONDITION},
+                {total}
+            {self._from_where(order)}
+            ORDER BY {ORDER_BY[order]}
+        """
+        params = list(self.params)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def count_sql(self) -> Tuple[str, List[Any]]:
+        return f"SELECT COUNT(*) {self._from_where()}", list(self.params)
+
+    def execute(self, cursor: sqlite3.Cursor, order: str = 'date', limit: Optional[int] = None,
+                with_total: bool = False) -> sqlite3.Cursor:
+        """Run the query; rows come back as ``PDFRow``."""
+        total = None
+        if with_total and not HAS_WINDOW_FUNCTIONS:
+            total = self.count(cursor)
+
+        cursor.row_factory = lambda _, row: PDFRow(*row[:6], bool(row[6]), row[7] if total is None else total)
+        return cursor.execute(*self.select_sql(order, limit, with_total))
+
+    def count(self, cursor: sqlite3.Cursor) -> int:
+        cursor.row_factory = None
+        cursor.execute(*self.count_sql())
+        return cursor.fetchone()[0]
+
+
+def row_version(filename: Optional[str], size: Optional[int]) -> str:
+    """Summarize the chat.db fields that say where an attachment's file is."""
+    return json.dumps([filename, size])
+
+
+def changed_ids(cursor: sqlite3.Cursor, versions: Dict[int, str]) -> Set[int]:
+    """Get which attachments' chat.db rows no longer match a saved ``row_version``."""
+    if not versions:
+        return set()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT ROWID, filename, total_bytes FROM attachment
+        WHERE ROWID IN (SELECT value FROM json_each(?))
+    """, (json.dumps(sorted(versions)),))
+    return {rowid for rowid, filename, size in cursor if row_version(filename, size) != versions[rowid]}
+
+
+def downloaded_ids(cursor: sqlite3.Cursor, attachment_ids: Iterable[int]) -> Set[int]:
+    """Get which of the given attachments chat.db now reports as downloaded."""
+    attachment_ids = list(attachment_ids)
+    found: Set[int] = set()
+    cursor.row_factory = None
+    for start in range(0, len(attachment_ids), MAX_IN_PARAMS):
+        chunk = attachment_ids[start:start + MAX_IN_PARAMS]
+        cursor.execute(f"""
+            SELECT attachment.ROWID FROM attachment
+            WHERE attachment.ROWID IN ({", ".join("?" * len(chunk))}) AND {DOWNLOADED_CONDITION}
+        """, chunk)
+        found.update(row[0] for row in cursor)
+    return found
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import time
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List
+
+# Stages in the order they happen; others are reported after these
+STAGES = ('scan', 'query', 'resolve', 'validate', 'dedup', 'copy', 'summary')
+
+
+class RunStats:
+    """Time, call count and bytes per stage of an extraction run.
+
+    Stages run on the copy workers report time summed across workers, so it
+    can exceed the run's duration. Each file's total processing time is kept
+    as well, for the p50/p95 latency.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._latencies = array('d')
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, nbytes: int = 0, calls: int = 1):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "bytes": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += calls
+            entry["bytes"] += nbytes
+
+    @contextmanager
+    def time(self, stage: str, nbytes: int = 0):
+        """Time a block as one call of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, nbytes)
+
+    def add_latency(self, seconds: float):
+        """Record how long one file took from lookup to copy."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def timed_rows(self, rows: Iterable, stage: str = 'query') -> Iterator:
+        """Yield rows from a cursor, adding the time spent fetching them.
+
+        The fetches are part of the query that produced the cursor, so they
+        add to that stage's time but not to its calls.
+        """
+        iterator = iter(rows)
+        fetching = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    row = next(iterator)
+                except StopIteration:
+                    fetching += time.perf_counter() - start
+                    return
+                fetching += time.perf_counter() - start
+                yield row
+        finally:
+            self.add(stage, fetching, calls=0)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def percentile(self, p: float) -> float:
+        """Get a per-file latency percentile (nearest rank), in seconds."""
+        with self._lock:
+            values = sorted(self._latencies)
+        if not values:
+            return 0.0
+        rank = max(1, min(len(values), round(p / 100 * len(values) + 0.5)))
+        return values[rank - 1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the timings for the JSON summary."""
+        ordered = sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+        return {
+            "duration_seconds": round(self.elapsed(), 3),
+            "stages": {
+                stage: {
+                    "seconds": round(self.stages[stage]["seconds"], 4),
+                    "calls": self.stages[stage]["calls"],
+                    "bytes": self.stages[stage]["bytes"]
+                } for stage in ordered
+            },
+            "file_latency_ms": {
+                "count": len(self._latencies),
+                "p50": round(self.percentile(50) * 1000, 2),
+                "p95": round(self.percentile(95) * 1000, 2),
+                "max": round(max(self._latencies, default=0.0) * 1000, 2)
+            }
+        }
+
+    def summary_lines(self) -> List[str]:
+        """Get the timings as lines for the readable summary."""
+        data = self.to_dict()
+        lines = [f"Duration: {data['duration_seconds']:.2f}s (stage times are summed across workers)"]
+        for stage, entry in data["stages"].items():
+            line = f"  {stage:<10} {entry['seconds']:>9.3f}s  {entry['calls']:>8} calls"
+            if entry["bytes"]:
+                line += f"  {entry['bytes'] / (1024 * 1024):>10.1f} MB"
+            lines.append(line)
+        latency = data["file_latency_ms"]
+        lines.append(f"Per-file latency: p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                     f"max {latency['max']} ms over {latency['count']} files")
+        return lines
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import os
+import mmap
+import stat
+from pathlib import Path
+from typing import Optional
+
+# Files outside these bounds are not treated as PDFs
+MIN_PDF_SIZE = 100
+MAX_PDF_SIZE = 2_000_000_000
+
+# The PDF spec puts %%EOF within the last 1024 bytes; allow some trailing junk
+TAIL_SIZE = 2048
+
+
+def check_pdf(path: Path, structural: bool = False, st: Optional[os.stat_result] = None) -> Optional[str]:
+    """Check that a file looks like a PDF without parsing it.
+
+    Returns None for a plausible PDF, otherwise a short reason. ``st`` lets a
+    caller that already stat-ed the file skip the stat here. With
+    ``structural`` the tail is also checked for ``startxref`` and ``%%EOF``,
+    which catches truncated downloads.
+    """
+    if st is None:
+        st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        return 'not_a_file'
+    if st.st_size < MIN_PDF_SIZE or st.st_size > MAX_PDF_SIZE:
+        return 'bad_size'
+
+    with open(path, 'rb') as f:
+        if not f.read(4).startswith(b'%PDF'):
+            return 'bad_header'
+        if not structural:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            tail = mm[max(0, st.st_size - TAIL_SIZE):]
+    if b'%%EOF' not in tail or b'startxref' not in tail:
+        return 'truncated'
+    return None
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import os
+import time
+import sqlite3
+from pathlib import Path
+import logging
+from typing import Callable, Optional, Tuple
+
+from core.chat_db import connect_chat_db
+
+logger = logging.getLogger(__name__)
+
+# Polling starts fast after a change and backs off while nothing happens
+MIN_POLL_INTERVAL = 0.5
+MAX_POLL_INTERVAL = 10.0
+
+
+class ChatDBWatcher:
+    """Detects writes to chat.db by cheap polling.
+
+    Each poll stats chat.db and its WAL and reads ``PRAGMA data_version`` on
+    a connection of our own, which changes whenever another connection
+    commits. The interval doubles while nothing changes, up to
+    ``max_interval``, and drops back to ``min_interval`` after a change.
+    """
+
+    def __init__(self, db_path: Path, min_interval: float = MIN_POLL_INTERVAL,
+                 max_interval: float = MAX_POLL_INTERVAL):
+        self.db_path = Path(db_path)
+        self.wal_path = self.db_path.with_name(self.db_path.name + "-wal")
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._signature = self._read_signature()
+
+    def _stat(self, path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _data_version(self) -> Optional[int]:
+        try:
+            if self._conn is None:
+                self._conn = connect_chat_db(self.db_path)
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            # Reopen on the next poll; the stat checks still work meanwhile
+            logger.debug(f"Could not read data_version: {e}")
+            self.close()
+            return None
+
+    def _read_signature(self):
+        return self._stat(self.db_path), self._stat(self.wal_path), self._data_version()
+
+    def wait_for_change(self, timeout: Optional[float] = None,
+                        stop_callback: Optional[Callable[[], bool]] = None) -> bool:
+        """Block until chat.db changes; returns False on timeout or stop."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not (stop_callback and stop_callback()):
+            delay = self.interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+            signature = self._read_signature()
+            if signature != self._signature:
+                self._signature = signature
+                self.interval = self.min_interval
+                return True
+            self.interval = min(self.interval * 2, self.max_interval)
+        return False
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 import os
 import sqlite3
-import shutil
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
 import logging
-import re
 from typing import Dict, Optional, List, Any, Tuple
 import json
 import tkinter as tk
@@ -18,7 +16,16 @@ import sys
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from core.pdf_extractor import IMessagePDFExtractor
+from core.pdf_extractor import IMessagePDFExtractor, PAGE_SIZE
+from core.analysis_cache import AnalysisCache
+from core.archive import ArchiveWriter
+from core.layout import DEFAULT_LAYOUT, OutputLayout
+from core.manifest import ExtractionManifest
+from core.queries import PDFFilter
+from core.chat_db import connect_chat_db
+from core.parallel import DEFAULT_WORKERS, ordered_map
+from core.copy_strategies import copy_file
+from core.events import EventChannel
 
 # Create logs directory in user's home directory
 log_dir = Path.home() / ".pdf_rescue_squad"
@@ -42,17 +49,28 @@ logger.info(f"Python version: {sys.version}")
 logger.info(f"Operating system: {os.uname().sysname} {os.uname().release}")
 logger.info(f"Log file location: {log_file}")
 
+def format_size(size_bytes: int) -> str:
+    """Format a byte count for display."""
+    if size_bytes < 1024:
+        return f"{size_bytes} B"
+    elif size_bytes < 1024*1024:
+        return f"{size_bytes/1024:.1f} KB"
+    else:
+        return f"{size_bytes/(1024*1024):.1f} MB"
+
 class PermissionChecker:
     @staticmethod
     def check_full_disk_access() -> bool:
         """Check if the app has Full Disk Access permission."""
         messages_db = Path.home() / "Library/Messages/chat.db"
         try:
-            # Try to open the Messages database
-            with sqlite3.connect(messages_db) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT 1")
+            # Try to open the Messages database read-only, as the extractor does
+            conn = connect_chat_db(messages_db)
+            try:
+                conn.execute("SELECT 1 FROM sqlite_master LIMIT 1")
                 return True
+            finally:
+                conn.close()
         except sqlite3.Error:
             return False
     
@@ -111,7 +129,7 @@ class PDFExtractorApp(tk.Tk):
         self.configure(background='#F9FBFD')
         
         # Initialize state
-        self.selected_pdfs = []
+        self.selection = SelectionModel()
         self.output_dir = Path.home() / "Downloads" / "Rescued_PDFs"
         
         # Create main container
@@ -820,11 +838,191 @@ Note: If messages are not appearing 🤔:
         """Proceed to analysis frame."""
         self.controller.show_frame(AnalysisFrame)
 
+class SelectionModel:
+    """PDFs picked for extraction, kept outside Tk.
+
+    Selected records are keyed by attachment ID with a running count and
+    byte total, so selecting, toggling and counting never touch the
+    Treeview. After ``select_all``, pages loaded later are selected as they
+    arrive; rows deselected by hand stay deselected.
+    """
+    
+    def __init__(self):
+        # Attachment ID -> record, in the order they were selected
+        self._selected: Dict[int, Dict[str, Any]] = {}
+        self.total_bytes = 0
+        self.select_new = False
+    
+    def __len__(self) -> int:
+        return len(self._selected)
+    
+    def __contains__(self, pdf_id: int) -> bool:
+        return pdf_id in self._selected
+    
+    def select(self, pdf: Dict[str, Any]):
+        """Select a record; missing files can't be selected."""
+        if pdf['exists'] and pdf['id'] not in self._selected:
+            self._selected[pdf['id']] = pdf
+            self.total_bytes += pdf['size'] or 0
+    
+    def deselect(self, pdf: Dict[str, Any]):
+        if self._selected.pop(pdf['id'], None) is not None:
+            self.total_bytes -= pdf['size'] or 0
+    
+    def toggle(self, pdf: Dict[str, Any]):
+        if pdf['id'] in self._selected:
+            self.deselect(pdf)
+        else:
+            self.select(pdf)
+    
+    def select_all(self, pdfs: List[Dict[str, Any]]):
+        """Select every loaded record and any loaded from now on."""
+        self.select_new = True
+        for pdf in pdfs:
+            self.select(pdf)
+    
+    def add_rows(self, pdfs: List[Dict[str, Any]]):
+        """Take note of newly loaded records."""
+        if self.select_new:
+            for pdf in pdfs:
+                self.select(pdf)
+    
+    def clear(self):
+        self._selected.clear()
+        self.total_bytes = 0
+        self.select_new = False
+    
+    def records(self) -> List[Dict[str, Any]]:
+        """Get the selected records."""
+        return list(self._selected.values())
+
+class VirtualPDFList:
+    """Treeview that only materializes the rows in view.
+
+    Records live in ``rows``. A small pool of Treeview items, one per
+    visible row plus a buffer, is refilled as the user scrolls, so the cost
+    of showing results doesn't depend on how many PDFs there are.
+    """
+    BUFFER_ROWS = 5
+    
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar, format_row):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.rows: List[Dict[str, Any]] = []
+        self.offset = 0
+        self.visible_rows = int(tree.cget('height'))
+        self._items: List[str] = []
+        self._row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        
+        scrollbar.config(command=self._on_scrollbar)
+        tree.bind('<MouseWheel>', self._on_wheel)
+        tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        tree.bind('<Up>', lambda e: self._move_focus(-1))
+        tree.bind('<Down>', lambda e: self._move_focus(1))
+        tree.bind('<Prior>', lambda e: self._scroll_by(-self.visible_rows))
+        tree.bind('<Next>', lambda e: self._scroll_by(self.visible_rows))
+        tree.bind('<Configure>', self._on_resize)
+    
+    def clear(self):
+        """Drop all rows."""
+        self.rows = []
+        self.offset = 0
+        self.refresh()
+    
+    def append(self, rows: List[Dict[str, Any]]):
+        """Add a page of rows at the end."""
+        self.rows.extend(rows)
+        self.refresh()
+    
+    def row_for_item(self, item: str) -> Optional[Dict[str, Any]]:
+        """Get the record currently shown by a Treeview item."""
+        if item not in self._items:
+            return None
+        index = self.offset + self._items.index(item)
+        return self.rows[index] if index < len(self.rows) else None
+    
+    def refresh(self):
+        """Refill the item pool from the rows at the current offset."""
+        wanted = self.visible_rows + self.BUFFER_ROWS
+        while len(self._items) < wanted:
+            self._items.append(self.tree.insert('', 'end'))
+        
+        for i, item in enumerate(self._items):
+            index = self.offset + i
+            if i < wanted and index < len(self.rows):
+                values, tags = self.format_row(self.rows[index])
+                self.tree.item(item, values=values, tags=tags)
+                self.tree.move(item, '', i)
+            else:
+                self.tree.detach(item)
+        # The buffer rows sit below the viewport; never let Tk scroll to them
+        self.tree.yview_moveto(0)
+        
+        total = max(len(self.rows), 1)
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+    
+    def _max_offset(self) -> int:
+        return max(0, len(self.rows) - self.visible_rows)
+    
+    def _scroll_to(self, offset: int):
+        offset = max(0, min(int(offset), self._max_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+    
+    def _scroll_by(self, rows: int):
+        self._scroll_to(self.offset + rows)
+        return 'break'
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self._scroll_to(float(amount) * len(self.rows))
+        elif unit == 'pages':
+            self._scroll_by(int(amount) * self.visible_rows)
+        else:
+            self._scroll_by(int(amount))
+    
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small per-notch deltas
+        delta = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        return self._scroll_by(-delta)
+    
+    def _move_focus(self, step: int):
+        focus = self.tree.focus()
+        position = self._items.index(focus) if focus in self._items else 0
+        position += step
+        if position < 0:
+            self._scroll_by(-1)
+            position = 0
+        elif position >= min(self.visible_rows, len(self.rows) - self.offset):
+            self._scroll_by(1)
+            position = min(self.visible_rows, len(self.rows) - self.offset) - 1
+        if 0 <= position < len(self._items):
+            self.tree.focus(self._items[position])
+            self.tree.selection_set(self._items[position])
+        return 'break'
+    
+    def _on_resize(self, event):
+        # Leave room for the heading row
+        visible = max(1, (event.height - self._row_height) // self._row_height)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self._scroll_to(self.offset)
+            self.refresh()
+
 class AnalysisFrame(BaseFrame):
+    # Records looked up on disk between two UI updates
+    RESOLVE_BATCH = 100
+    
     def __init__(self, parent, controller):
         super().__init__(parent, controller)
-        self._create_widgets()
         self.pdfs = []
+        self._scan_id = 0
+        # Filters of the current scan
+        self.filters = PDFFilter()
+        self._create_widgets()
     
     def _create_widgets(self):
         # Create header with fun text
@@ -835,6 +1033,35 @@ class AnalysisFrame(BaseFrame):
         )
         header.pack(pady=(40, 20), padx=40)
         
+        # Filters, applied by the database query; empty fields match everything
+        filter_frame = ttk.Frame(self, style='Main.TFrame')
+        filter_frame.pack(fill='x', padx=40)
+        
+        self.filter_vars = {}
+        fields = [
+            ('since', "From (YYYY-MM-DD)", 12),
+            ('until', "To", 12),
+            ('sender', "Sender", 18),
+            ('chat', "Chat", 18),
+            ('min_kb', "Min KB", 7),
+            ('max_kb', "Max KB", 7),
+            ('name', "Name", 14)
+        ]
+        for name, label, width in fields:
+            ttk.Label(filter_frame, text=label).pack(side='left', padx=(5, 2))
+            var = tk.StringVar()
+            entry = ttk.Entry(filter_frame, textvariable=var, width=width)
+            entry.pack(side='left')
+            entry.bind('<Return>', lambda event: self._start_scan())
+            self.filter_vars[name] = var
+        
+        ttk.Button(
+            filter_frame,
+            text="Apply",
+            command=self._start_scan,
+            style='Secondary.TButton'
+        ).pack(side='left', padx=10)
+        
         # Progress section
         self.progress_frame = ttk.Frame(self, style='Main.TFrame')
         self.progress_frame.pack(pady=20)
@@ -873,10 +1100,6 @@ class AnalysisFrame(BaseFrame):
             height=15
         )
         
-        # Configure scrollbar
-        scrollbar.config(command=self.tree.yview)
-        self.tree.config(yscrollcommand=scrollbar.set)
-        
         # Configure columns
         self.tree.column('select', width=30, anchor='center')
         self.tree.column('filename', width=300, anchor='w')
@@ -893,6 +1116,13 @@ class AnalysisFrame(BaseFrame):
         
         self.tree.pack(fill='both', expand=True)
         
+        # Only the rows in view exist as Treeview items
+        self.results = VirtualPDFList(self.tree, scrollbar, self._format_row)
+        self.pdfs = self.results.rows
+        
+        # Rows whose file is missing are greyed out
+        self.tree.tag_configure('disabled', foreground='#999999')
+        
         # Selection controls
         controls_frame = ttk.Frame(self.results_frame, style='Main.TFrame')
         controls_frame.pack(fill='x', padx=40, pady=20)
@@ -918,6 +1148,13 @@ class AnalysisFrame(BaseFrame):
         )
         self.selection_label.pack(side='right', padx=5)
         
+        self.scan_var = tk.StringVar()
+        ttk.Label(
+            controls_frame,
+            textvariable=self.scan_var,
+            style='Subheader.TLabel'
+        ).pack(side='right', padx=20)
+        
         # Navigation buttons
         self.button_frame = ttk.Frame(self, style='Main.TFrame')
         
@@ -940,95 +1177,242 @@ class AnalysisFrame(BaseFrame):
         # Bind selection events
         self.tree.bind('<<TreeviewSelect>>', self._on_selection_change)
         self.tree.bind('<space>', self._toggle_selection)
+        self.tree.bind('<Button-1>', self._on_click)
     
     def on_show(self):
         """Start analysis when frame is shown."""
+        self._start_scan()
+    
+    def _read_filters(self) -> PDFFilter:
+        """Build the filter from the entry fields; raises ValueError on bad input."""
+        values = {name: var.get().strip() for name, var in self.filter_vars.items()}
+        
+        def day(field, label):
+            try:
+                return date.fromisoformat(values[field]) if values[field] else None
+            except ValueError:
+                raise ValueError(f"{label} must be a date like 2023-01-31")
+        
+        def kilobytes(field, label):
+            try:
+                return int(float(values[field]) * 1024) if values[field] else None
+            except ValueError:
+                raise ValueError(f"{label} must be a number of kilobytes")
+        
+        return PDFFilter(
+            since=day('since', "From"),
+            until=day('until', "To"),
+            senders=[values['sender']],
+            chats=[values['chat']],
+            min_size=kilobytes('min_kb', "Min KB"),
+            max_size=kilobytes('max_kb', "Max KB"),
+            name=values['name']
+        )
+    
+    def _start_scan(self):
+        """List the PDFs matching the current filters, replacing any earlier scan."""
+        try:
+            filters = self._read_filters()
+        except ValueError as e:
+            messagebox.showerror("Invalid filter", str(e))
+            return
+        
         self.progress_frame.pack(pady=20)
         self.progress_bar.pack(pady=(0, 40))
         self.progress_bar.start()
         self.progress_var.set("Analyzing Messages database...")
+        self.filters = filters
         
         # Hide results if showing again
         self.results_frame.pack_forget()
         self.button_frame.pack_forget()
         
         # Clear previous results
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        self.results.clear()
+        self.pdfs = self.results.rows
+        self.controller.selection.clear()
+        self._update_selection_count()
+        
+        # Threads of an earlier scan notice the new ID and stop
+        self._scan_id += 1
         
         # Start analysis in background thread
-        threading.Thread(target=self._analyze_messages, daemon=True).start()
+        threading.Thread(target=self._analyze_messages, args=(self._scan_id, filters), daemon=True).start()
     
-    def _analyze_messages(self):
-        """Analyze messages database for PDFs."""
+    def _analyze_messages(self, scan_id, filters=None):
+        """Stream PDFs from the messages database to the UI, newest first.
+
+        Pages are posted as soon as they are read. Their files are looked up
+        on a second thread, behind the rows already on screen. When the
+        library hasn't changed since the last analysis, the cached records
+        are shown instead and only new or missing files are looked up. The
+        cache covers the whole library, so filtered scans bypass it.
+        """
+        pending = Queue()
+        filtered = filters is not None and not filters.is_empty()
         try:
             extractor = IMessagePDFExtractor()
-            self.pdfs = extractor.get_pdf_list()
-            
-            # Update UI in main thread
-            self.after(0, self._show_results)
+            cache = None if filtered else AnalysisCache.load(log_dir)
+            key = None if filtered else extractor.analysis_key()
+        except Exception as e:
+            self.after(0, lambda: self._analysis_failed(scan_id, e))
+            return
+        
+        threading.Thread(target=self._resolve_paths, args=(scan_id, extractor, pending, cache, key),
+                         daemon=True).start()
+        try:
+            cached = extractor.get_cached_pdf_list(cache, key) if cache else None
+            if cached is not None:
+                for start in range(0, len(cached), PAGE_SIZE):
+                    page = cached[start:start + PAGE_SIZE]
+                    pending.put([pdf for pdf in page if pdf['exists'] is None])
+                    self.after(0, lambda page=page: self._append_page(scan_id, page))
+                if not cached:
+                    self.after(0, lambda: self._append_page(scan_id, []))
+                return
             
+            after = None
+            while scan_id == self._scan_id:
+                page, after = extractor.get_pdf_page(after, resolve=False, filters=filters)
+                # Rows chat.db reports as not downloaded need no lookup
+                pending.put([pdf for pdf in page if pdf['exists'] is None])
+                
+                # Update UI in main thread
+                self.after(0, lambda page=page: self._append_page(scan_id, page))
+                if after is None:
+                    break
+                    
         except Exception as e:
-            self.after(0, lambda: messagebox.showerror(
-                "Error",
-                f"Failed to analyze messages: {str(e)}"
-            ))
-            self.after(0, lambda: self.controller.show_frame(SyncCheckFrame))
+            self.after(0, lambda: self._analysis_failed(scan_id, e))
+        finally:
+            pending.put(None)
+            extractor.close()
     
-    def _show_results(self):
-        """Show analysis results."""
-        self.progress_bar.stop()
-        self.progress_frame.pack_forget()
-        
-        # Update header and progress text
+    def _resolve_paths(self, scan_id, extractor, pending, cache, key):
+        """Check which listed PDFs are on disk and report them in small batches."""
+        while True:
+            page = pending.get()
+            if page is None or scan_id != self._scan_id:
+                break
+            for start in range(0, len(page), self.RESOLVE_BATCH):
+                if scan_id != self._scan_id:
+                    return
+                resolved = [(pdf, extractor.resolve_pdf(pdf)) for pdf in page[start:start + self.RESOLVE_BATCH]]
+                self.after(0, lambda resolved=resolved: self._apply_paths(scan_id, resolved))
+        self.after(0, lambda: self._analysis_done(scan_id, cache, key))
+    
+    def _analysis_failed(self, scan_id, error):
+        if scan_id != self._scan_id:
+            return
+        # Keeps the partial results out of the cache
+        self._scan_id += 1
+        messagebox.showerror(
+            "Error",
+            f"Failed to analyze messages: {str(error)}"
+        )
+        self.controller.show_frame(SyncCheckFrame)
+    
+    def _append_page(self, scan_id, page):
+        if scan_id != self._scan_id:
+            return
         if not self.pdfs:
-            self.progress_var.set("No PDFs found in Messages")
+            self._show_results(page)
+        self.results.append(page)
+        self.scan_var.set(f"Scanning... {len(self.pdfs)} PDFs so far")
+    
+    def _apply_paths(self, scan_id, resolved):
+        """Record lookup results on the main thread and repaint visible rows."""
+        if scan_id != self._scan_id:
             return
-        
-        # Populate tree
-        for pdf in self.pdfs:
-            # Format size
-            size_bytes = pdf['size']
-            if size_bytes < 1024:
-                size = f"{size_bytes} B"
-            elif size_bytes < 1024*1024:
-                size = f"{size_bytes/1024:.1f} KB"
+        for pdf, path in resolved:
+            pdf['path'] = str(path) if path else None
+            pdf['exists'] = path is not None
+        self.controller.selection.add_rows([pdf for pdf, _ in resolved])
+        self.results.refresh()
+        self._update_selection_count()
+    
+    def _analysis_done(self, scan_id, cache, key):
+        if scan_id != self._scan_id:
+            return
+        if cache is not None and cache.key != key:
+            threading.Thread(target=self._save_cache, args=(cache, key, list(self.pdfs)), daemon=True).start()
+        if self.pdfs:
+            available = sum(1 for pdf in self.pdfs if pdf['exists'])
+            offloaded = sum(1 for pdf in self.pdfs if pdf['downloaded'] is False)
+            status = f"{len(self.pdfs)} PDFs found, {available} on this Mac"
+            if offloaded:
+                status += f", {offloaded} only in iCloud"
+            self.scan_var.set(status)
+    
+    def _save_cache(self, cache, key, pdfs):
+        try:
+            cache.save(key, pdfs)
+        except OSError as e:
+            logger.warning(f"Could not save analysis cache: {e}")
+    
+    def _format_row(self, pdf) -> Tuple[tuple, tuple]:
+        """Format one record for display; only called for rows in view."""
+        size = format_size(pdf['size'] or 0)
+        
+        # Format date
+        date = datetime.fromisoformat(pdf['date']).strftime("%Y-%m-%d %H:%M")
+        
+        if pdf['id'] in self.controller.selection:
+            selected = '✓'
+        elif pdf['downloaded'] is False:
+            # Only in iCloud
+            selected = '☁'
+        else:
+            # Still being looked up on disk
+            selected = '…' if pdf['exists'] is None else ''
+        values = (selected, pdf['filename'], date, size, pdf['sender'] or 'Unknown')
+        return values, ('disabled',) if pdf['exists'] is False else ()
+    
+    def _show_results(self, page):
+        """Show analysis results."""
+        if not page:
+            # Update progress text
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+            if self.filters.is_empty():
+                self.progress_var.set("No PDFs found in Messages")
             else:
-                size = f"{size_bytes/(1024*1024):.1f} MB"
-            
-            # Format date
-            date = datetime.fromisoformat(pdf['date']).strftime("%Y-%m-%d %H:%M")
-            
-            self.tree.insert('', 'end',
-                values=('', pdf['filename'], date, size, pdf['sender'] or 'Unknown'),
-                tags=('disabled',) if not pdf['exists'] else ())
+                self.progress_var.set("No PDFs match these filters")
+            return
+        
+        self.progress_bar.stop()
+        self.progress_frame.pack_forget()
         
         # Show results
         self.results_frame.pack(pady=20, fill='both', expand=True)
         self.button_frame.pack(pady=(0, 40))
-        
-        # Configure tag for disabled items
-        self.tree.tag_configure('disabled', foreground='#999999')
     
     def _select_all(self):
         """Select all available PDFs."""
-        for item in self.tree.get_children():
-            if 'disabled' not in self.tree.item(item)['tags']:
-                self.tree.set(item, 'select', '✓')
+        self.controller.selection.select_all(self.pdfs)
+        self.results.refresh()
         self._update_selection_count()
     
     def _deselect_all(self):
         """Deselect all PDFs."""
-        for item in self.tree.get_children():
-            self.tree.set(item, 'select', '')
+        self.controller.selection.clear()
+        self.results.refresh()
         self._update_selection_count()
     
     def _toggle_selection(self, event):
         """Toggle selection of current item."""
-        item = self.tree.focus()
-        if item and 'disabled' not in self.tree.item(item)['tags']:
-            current = self.tree.set(item, 'select')
-            self.tree.set(item, 'select', '' if current == '✓' else '✓')
+        self._toggle_item(self.tree.focus())
+    
+    def _on_click(self, event):
+        """Toggle a row when its checkbox column is clicked."""
+        if self.tree.identify_column(event.x) == '#1':
+            self._toggle_item(self.tree.identify_row(event.y))
+    
+    def _toggle_item(self, item):
+        pdf = self.results.row_for_item(item)
+        if pdf and pdf['exists']:
+            self.controller.selection.toggle(pdf)
+            self.results.refresh()
             self._update_selection_count()
     
     def _on_selection_change(self, event):
@@ -1037,11 +1421,11 @@ class AnalysisFrame(BaseFrame):
     
     def _update_selection_count(self):
         """Update selection count and extract button state."""
-        count = sum(1 for item in self.tree.get_children()
-                   if self.tree.set(item, 'select') == '✓')
+        selection = self.controller.selection
+        count = len(selection)
         
         self.selection_label.configure(
-            text=f"{count} PDF{'s' if count != 1 else ''} selected"
+            text=f"{count} PDF{'s' if count != 1 else ''} selected ({format_size(selection.total_bytes)})"
         )
         
         self.extract_button.configure(
@@ -1050,19 +1434,7 @@ class AnalysisFrame(BaseFrame):
     
     def _on_extract(self):
         """Proceed to extraction frame with selected PDFs."""
-        # Get selected PDFs
-        selected = []
-        for item in self.tree.get_children():
-            if self.tree.set(item, 'select') == '✓':
-                idx = len(selected)
-                pdf = self.pdfs[idx]
-                if pdf['exists']:
-                    selected.append(pdf)
-        
-        # Store selected PDFs in controller
-        self.controller.selected_pdfs = selected
-        
-        # Show extraction frame
+        # The extraction frame reads the selection from the controller
         self.controller.show_frame(ExtractionFrame)
 
 class ExtractionFrame(BaseFrame):
@@ -1070,6 +1442,14 @@ class ExtractionFrame(BaseFrame):
         super().__init__(parent, controller)
         self._create_widgets()
         self.extraction_running = False
+        self.workers = DEFAULT_WORKERS
+        self.copy_mode = 'copy'
+        self.layout = OutputLayout()
+        self.message_queue = EventChannel()
+        
+        # The extraction thread wakes us through this event as soon as it
+        # has something to report
+        self.bind('<<ExtractionEvents>>', self._process_messages)
     
     def _create_widgets(self):
         # Create header
@@ -1104,6 +1484,32 @@ class ExtractionFrame(BaseFrame):
         )
         output_frame.pack(padx=40, pady=(0, 20), fill='x')
         
+        # One archive is much faster than many small files on network shares
+        format_frame = ttk.Frame(output_frame)
+        format_frame.pack(side='bottom', fill='x', pady=(10, 0))
+        
+        # Subfolders by month keep folders small; the attachment ID keeps names unique
+        layout_frame = ttk.Frame(output_frame)
+        layout_frame.pack(side='bottom', fill='x', pady=(10, 0))
+        
+        ttk.Label(layout_frame, text="Folder layout:").pack(side='left', padx=(0, 10))
+        self.layout_var = tk.StringVar(value=DEFAULT_LAYOUT)
+        ttk.Entry(
+            layout_frame,
+            textvariable=self.layout_var,
+            font=('SF Pro Text', 12)
+        ).pack(side='left', fill='x', expand=True)
+        
+        ttk.Label(format_frame, text="Save as:").pack(side='left', padx=(0, 10))
+        self.output_format = tk.StringVar(value='folder')
+        for value, label in (('folder', "Separate files"), ('zip', "One ZIP archive"), ('tar', "One tar archive")):
+            ttk.Radiobutton(
+                format_frame,
+                text=label,
+                value=value,
+                variable=self.output_format
+            ).pack(side='left', padx=5)
+        
         self.output_path = tk.StringVar(
             value=str(self.controller.output_dir)
         )
@@ -1175,17 +1581,9 @@ class ExtractionFrame(BaseFrame):
     
     def on_show(self):
         """Update summary when frame is shown."""
-        pdfs = self.controller.selected_pdfs
-        count = len(pdfs)
-        total_size = sum(pdf['size'] for pdf in pdfs)
-        
-        # Format total size
-        if total_size < 1024:
-            size = f"{total_size} B"
-        elif total_size < 1024*1024:
-            size = f"{total_size/1024:.1f} KB"
-        else:
-            size = f"{total_size/(1024*1024):.1f} MB"
+        selection = self.controller.selection
+        count = len(selection)
+        size = format_size(selection.total_bytes)
         
         self.summary_var.set(
             f"Mission objective: Rescue {count} PDF{'s' if count != 1 else ''} "
@@ -1204,11 +1602,17 @@ class ExtractionFrame(BaseFrame):
     
     def _start_extraction(self):
         """Start PDF extraction."""
+        try:
+            self.layout = OutputLayout(self.layout_var.get().strip())
+        except ValueError as e:
+            messagebox.showerror("Invalid folder layout", str(e))
+            return
+        
         self.extract_button.configure(state='disabled')
         self.stop_button.configure(state='normal')
         
-        # Create message queue for progress updates
-        self.message_queue = Queue()
+        # Create message channel for progress updates
+        self.message_queue = EventChannel(notify=self._wake_ui)
         self.extraction_running = True
         
         # Start extraction in background thread
@@ -1226,97 +1630,199 @@ class ExtractionFrame(BaseFrame):
         self.stop_button.configure(state='disabled')
         self.extract_button.configure(state='normal')
     
+    def _destination(self, pdf) -> str:
+        """Get a PDF's path relative to the landing zone, from the layout."""
+        return self.layout.path_for(pdf['id'], pdf['filename'], datetime.fromisoformat(pdf['date']),
+                                    pdf['sender'], pdf.get('chat'))
+    
+    def _source_of(self, pdf) -> Optional[Path]:
+        """Get a PDF's file if it is there in full; runs on a copy worker."""
+        source_path = Path(pdf['path'])
+        try:
+            size = source_path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if pdf['size'] and size < pdf['size']:
+            # Shorter than chat.db says: still downloading or cut off
+            return None
+        return source_path
+    
+    def _copy_pdf(self, pdf, rel_path: str, output_dir: Path) -> Optional[str]:
+        """Copy one PDF; runs on a copy worker."""
+        source_path = self._source_of(pdf)
+        if source_path is None:
+            return None
+        
+        # Destinations are unique per attachment, so workers never share one
+        dest_path = self.layout.make_parent(output_dir, rel_path)
+        copy_file(source_path, dest_path, self.copy_mode)
+        return rel_path
+    
+    def _record(self, manifest: ExtractionManifest, pdf, status: str, dest: Optional[str] = None, detail=None):
+        """Journal a PDF's outcome in the landing zone's manifest."""
+        manifest.record(pdf['id'], status, filename=pdf['source'], source=pdf['path'], dest=dest,
+                        size=pdf['size'], detail=detail, message_date=datetime.fromisoformat(pdf['date']))
+    
     def _extract_pdfs(self):
         """Extract PDFs in background thread."""
+        archive = None
+        manifest = None
         try:
             # Create output directory
             output_dir = Path(self.output_path.get())
             output_dir.mkdir(parents=True, exist_ok=True)
             
             # Get total size for progress calculation
-            total_size = sum(pdf['size'] for pdf in self.controller.selected_pdfs)
+            selection = self.controller.selection
+            pdfs = selection.records()
+            total_size = selection.total_bytes
             processed_size = 0
             
-            # Extract each PDF
-            for i, pdf in enumerate(self.controller.selected_pdfs, 1):
-                if not self.extraction_running:
-                    self.message_queue.put({
-                        'type': 'progress',
-                        'text': "Mission aborted! 🛑",
-                        'percent': 0
-                    })
-                    break
-                
-                try:
-                    # Get source path
-                    source_path = Path(pdf['path'])
-                    if not source_path.exists():
-                        continue
-                    
-                    # Create destination path
-                    safe_filename = re.sub(r'[<>:"/\\|?*]', '_', pdf['filename'])
-                    dest_path = output_dir / safe_filename
-                    
-                    # Copy file
-                    shutil.copy2(source_path, dest_path)
-                    
-                    # Update progress
-                    processed_size += pdf['size']
-                    percent = int((processed_size / total_size) * 100)
-                    
-                    self.message_queue.put({
-                        'type': 'progress',
-                        'text': f"Rescuing PDF {i}/{len(self.controller.selected_pdfs)}: {safe_filename} 🛸",
-                        'percent': percent
-                    })
-                    
-                except Exception as e:
+            if self.output_format.get() != 'folder':
+                stamp = datetime.now().strftime('%Y-%m-%d %H.%M.%S')
+                archive = ArchiveWriter(output_dir / f"Rescued PDFs {stamp}.{self.output_format.get()}")
+                # The archive carries its own manifest
+                manifest = ExtractionManifest.temporary_file()
+            else:
+                manifest = ExtractionManifest.open(output_dir)
+            # Where earlier rescues into this landing zone put each PDF
+            finished = manifest.completed()
+            manifest.start_run(mode='selection')
+            
+            # List the landing zone once; PDFs whose destination is already
+            # there, or that the journal shows were rescued under another
+            # layout and are still there, are done. Interrupted copies never
+            # reach their final name, so they are simply done again.
+            self.layout.scan(None if archive else output_dir)
+            todo = []
+            already = 0
+            for pdf in pdfs:
+                rel_path = self._destination(pdf)
+                previous = finished.get(pdf['id'])
+                if self.layout.is_taken(previous) or not self.layout.claim(rel_path):
+                    already += 1
+                    self._record(manifest, pdf, 'exists', dest=previous or rel_path)
+                else:
+                    todo.append((pdf, rel_path))
+            
+            # Copy on a worker pool; results still arrive in selection order.
+            # For an archive the workers only check the files and this thread
+            # appends them, so the archive is written in one sequential pass.
+            if archive:
+                work = lambda item: self._source_of(item[0])
+            else:
+                work = lambda item: self._copy_pdf(item[0], item[1], output_dir)
+            i = 0
+            incomplete = 0
+            for (pdf, rel_path), outcome, error in ordered_map(
+                work, todo, workers=self.workers, stop_callback=lambda: not self.extraction_running
+            ):
+                i += 1
+                safe_filename = outcome
+                if archive and outcome is not None and not error:
+                    safe_filename = archive.add_file(
+                        outcome, rel_path, attachment_id=pdf['id'], date=pdf['date'], sender=pdf['sender']
+                    )
+                if error:
+                    self._record(manifest, pdf, 'copy_failed', dest=rel_path, detail=error)
                     self.message_queue.put({
                         'type': 'error',
-                        'text': f"Failed to rescue {pdf['filename']}: {str(e)} 💥"
+                        'text': f"Failed to rescue {pdf['filename']}: {str(error)} 💥"
                     })
+                    continue
+                if safe_filename is None:
+                    incomplete += 1
+                    self._record(manifest, pdf, 'truncated' if pdf['path'] and os.path.exists(pdf['path'])
+                                 else 'missing')
+                    continue
+                self._record(manifest, pdf, 'archive' if archive else 'copied', dest=safe_filename)
+                
+                # Update progress
+                processed_size += pdf['size'] or 0
+                percent = int((processed_size / total_size) * 100) if total_size else int(i / len(todo) * 100)
+                
+                self.message_queue.put({
+                    'type': 'progress',
+                    'text': f"Rescuing PDF {i}/{len(todo)}: {safe_filename} 🛸",
+                    'percent': percent
+                })
             
-            if self.extraction_running:
+            if archive:
+                # Also when aborted, so the PDFs rescued so far are usable
+                archive.close({
+                    "timestamp": datetime.now().isoformat(),
+                    "selected": len(pdfs),
+                    "skipped_incomplete": incomplete,
+                    "complete": self.extraction_running
+                })
+                archive = None
+            manifest.finish_run(len(pdfs))
+            
+            if not self.extraction_running:
                 self.message_queue.put({
-                    'type': 'complete',
-                    'text': f"Mission accomplished! Successfully rescued {i} PDFs to safety! 🎉"
+                    'type': 'progress',
+                    'text': "Mission aborted! 🛑",
+                    'percent': 0
                 })
+            else:
+                text = f"Mission accomplished! Successfully rescued {i - incomplete} PDFs to safety! 🎉"
+                if already:
+                    text += f"\n{already} were already in the landing zone."
+                if incomplete:
+                    text += f"\n{incomplete} were missing or not fully downloaded and were skipped."
+                self.message_queue.put({'type': 'complete', 'text': text})
             
         except Exception as e:
+            if archive:
+                archive.abort()
             self.message_queue.put({
                 'type': 'error',
                 'text': f"Mission failure: {str(e)} 💥"
             })
+        finally:
+            if manifest:
+                manifest.close()
     
-    def _process_messages(self):
-        """Process messages from extraction thread."""
+    def _wake_ui(self):
+        """Ask the Tk thread to drain events; called from the extraction thread."""
         try:
-            message = self.message_queue.get_nowait()
-            
+            self.event_generate('<<ExtractionEvents>>', when='tail')
+        except (RuntimeError, tk.TclError):
+            # Tcl built without threads, or window gone; the fallback poll copes
+            pass
+    
+    def _process_messages(self, event=None):
+        """Process every pending message from extraction thread."""
+        finished = None
+        for message in self.message_queue.drain():
             if message['type'] == 'progress':
                 self.progress_var.set(message['text'])
                 if 'percent' in message:
                     self.progress_bar.configure(value=message['percent'])
-            elif message['type'] == 'error':
-                messagebox.showerror("Error", message['text'])
-                self._stop_extraction()
-            elif message['type'] == 'complete':
-                self.progress_var.set(message['text'])
-                self.progress_bar.configure(value=100)
-                self._stop_extraction()
-                
-                # Ask to open output directory
-                if messagebox.askyesno(
-                    "Extraction Complete",
-                    f"{message['text']}\n\nWould you like to open the output directory?"
-                ):
-                    self._open_output_dir()
+            elif message['type'] in ('error', 'complete') and finished is None:
+                # Handled once the rest of the batch has been applied
+                finished = message
+
+        if finished and finished['type'] == 'error':
+            messagebox.showerror("Error", finished['text'])
+            self._stop_extraction()
+            return
+        if finished:
+            self.progress_var.set(finished['text'])
+            self.progress_bar.configure(value=100)
+            self._stop_extraction()
             
-        except:
-            pass
+            # Ask to open output directory
+            if messagebox.askyesno(
+                "Extraction Complete",
+                f"{finished['text']}\n\nWould you like to open the output directory?"
+            ):
+                self._open_output_dir()
+            return
         
-        if self.extraction_running:
-            self.after(100, self._process_messages)
+        # Slow fallback poll in case a wake-up event could not be posted
+        if self.extraction_running and event is None:
+            self.after(500, self._process_messages)
     
     def _open_output_dir(self):
         """Open the output directory in Finder."""
@@ -14,7 +14,23 @@ DATA_FILES = [
     'requirements.txt',
     'src/core/imessage_pdf_extract.py',
     'src/gui/imessage_pdf_extract_gui.py',
-    'src/core/pdf_extractor.py'
+    'src/core/pdf_extractor.py',
+    'src/core/attachments.py',
+    'src/core/chat_db.py',
+    'src/core/extraction_state.py',
+    'src/core/dedup.py',
+    'src/core/parallel.py',
+    'src/core/copy_strategies.py',
+    'src/core/validation.py',
+    'src/core/events.py',
+    'src/core/analysis_cache.py',
+    'src/core/run_stats.py',
+    'src/core/metrics.py',
+    'src/core/watch.py',
+    'src/core/queries.py',
+    'src/core/archive.py',
+    'src/core/layout.py',
+    'src/core/manifest.py'
 ]
 
 OPTIONS = {
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""End-to-end tests of extract_pdfs against a synthetic Messages library.
+
+Each test builds a small library with utils/make_fixture.py and extracts
+from it into a temporary directory.
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import sqlite3
+import fnmatch
+import hashlib
+import logging
+import tempfile
+import unittest
+import subprocess
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+from core.pdf_extractor import IMessagePDFExtractor
+from core.queries import PDFFilter
+from utils.make_fixture import apple_time, build_library, pdf_body
+
+FIXTURE = dict(attachments=400, pdf_ratio=0.5, duplicate_ratio=0.2, missing=5, corrupt=6, offloaded=4,
+               pdf_size=4096, senders=5, seed=1)
+
+# Run in a child process that dies without cleaning up after `after` records
+KILLED_RUN = """
+import os, sys, logging
+sys.path.insert(0, sys.argv[1])
+logging.disable(logging.CRITICAL)
+from core import manifest
+from core.pdf_extractor import IMessagePDFExtractor
+
+manifest.BATCH_SIZE = 10
+after = int(sys.argv[4])
+record = manifest.ExtractionManifest.record
+recorded = 0
+
+def record_then_die(self, *args, **kwargs):
+    global recorded
+    record(self, *args, **kwargs)
+    recorded += 1
+    if recorded == after:
+        os._exit(9)
+
+manifest.ExtractionManifest.record = record_then_die
+IMessagePDFExtractor(sys.argv[3], library_root=sys.argv[2], workers=4).extract_pdfs()
+"""
+
+
+def setUpModule():
+    logging.disable(logging.CRITICAL)
+
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+
+def extracted(output_dir: Path):
+    """Get the PDFs in an output directory, by relative path, with their digests."""
+    return {str(path.relative_to(output_dir)): hashlib.sha256(path.read_bytes()).hexdigest()
+            for path in output_dir.rglob('*') if path.is_file() and path.suffix == '.pdf'}
+
+
+def outcomes(output_dir: Path):
+    """Count the latest recorded outcome of every attachment in the manifest."""
+    db = sqlite3.connect(str(output_dir / "extraction_manifest.db"))
+    try:
+        return dict(db.execute("SELECT status, COUNT(*) FROM latest_files GROUP BY status"))
+    finally:
+        db.close()
+
+
+def add_pdf(root: Path) -> int:
+    """Add a new downloaded PDF to a fixture library, as Messages would; returns its ROWID."""
+    db = sqlite3.connect(str(root / "chat.db"))
+    with db:
+        attachment_id = db.execute("SELECT MAX(ROWID) FROM attachment").fetchone()[0] + 1
+        message_id = db.execute("SELECT MAX(ROWID) FROM message").fetchone()[0] + 1
+        guid = f"00000000-0000-4000-8000-{attachment_id:012d}"
+        name = f"New {attachment_id}.pdf"
+        rel = f"Attachments/00/00/{guid}/{name}"
+        body = pdf_body(random.Random(attachment_id), 2048)
+        (root / rel).parent.mkdir(parents=True)
+        (root / rel).write_bytes(body)
+        date = apple_time(1_700_000_000 + attachment_id)
+        db.execute("INSERT INTO message (ROWID, guid, handle_id, service, date, date_read, date_delivered, "
+                   "is_from_me, cache_has_attachments) VALUES (?, ?, 1, 'iMessage', ?, ?, ?, 0, 1)",
+                   (message_id, f"msg-{guid}", date, date, date))
+        db.execute("INSERT INTO attachment (ROWID, guid, created_date, start_date, filename, uti, mime_type, "
+                   "transfer_state, is_outgoing, transfer_name, total_bytes) "
+                   "VALUES (?, ?, ?, ?, ?, 'com.adobe.pdf', 'application/pdf', 5, 0, ?, ?)",
+                   (attachment_id, guid, date, date, f"~/Library/Messages/{rel}", name, len(body)))
+        db.execute("INSERT INTO message_attachment_join VALUES (?, ?)", (message_id, attachment_id))
+        db.execute("INSERT INTO chat_message_join VALUES (1, ?, ?)", (message_id, date))
+    db.close()
+    return attachment_id
+
+
+class ExtractionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.library = self.tmp / "Messages"
+        self.counts = build_library(self.library, **FIXTURE)
+
+    def extract(self, output_dir: Path, workers: int = 4, **kwargs) -> IMessagePDFExtractor:
+        extractor = IMessagePDFExtractor(str(output_dir), library_root=str(self.library), workers=workers)
+        self.addCleanup(extractor.close)
+        extractor.extract_pdfs(**kwargs)
+        return extractor
+
+    def assertSameContent(self, output_dir: Path, expected_dir: Path):
+        # Which of several duplicates is stored depends on the order they were
+        # copied in, so compare what was stored rather than where
+        files, expected = extracted(output_dir), extracted(expected_dir)
+        self.assertEqual(len(files), len(expected))
+        self.assertEqual(set(files.values()), set(expected.values()))
+
+    def summary(self, output_dir: Path):
+        with open(output_dir / "extraction_summary.json") as f:
+            return json.load(f)
+
+    def test_incremental_rerun(self):
+        out = self.tmp / "out"
+        first = self.extract(out)
+        self.assertEqual(first.total_found, self.counts['pdfs'])
+        files = extracted(out)
+        self.assertEqual(len(files), first.successful_copies)
+
+        # Only the incomplete downloads are looked at again
+        truncated = self.summary(out)['skipped_by_reason'].get('truncated', 0)
+        again = self.extract(out)
+        self.assertEqual(again.total_found, truncated)
+        self.assertEqual(again.successful_copies, 0)
+        self.assertEqual(extracted(out), files)
+
+        attachment_id = add_pdf(self.library)
+        new = self.extract(out)
+        self.assertEqual(new.total_found, truncated + 1)
+        self.assertEqual(new.successful_copies, 1)
+        added = set(extracted(out)) - set(files)
+        self.assertEqual(len(added), 1)
+        self.assertTrue(added.pop().endswith(f"_{attachment_id}.pdf"))
+
+        full = self.extract(out, full=True)
+        self.assertEqual(full.total_found, self.counts['pdfs'] + 1)
+        self.assertEqual(full.successful_copies, 0)
+
+    def test_resume_after_kill(self):
+        out = self.tmp / "out"
+        result = subprocess.run([sys.executable, "-c", KILLED_RUN, str(SRC_DIR), str(self.library), str(out), "120"])
+        self.assertEqual(result.returncode, 9)
+        self.assertTrue((out / "extraction_manifest.db").exists())
+
+        resumed = self.extract(out)
+        self.assertLess(resumed.total_found, self.counts['pdfs'])
+        clean = self.tmp / "clean"
+        self.extract(clean)
+        self.assertSameContent(out, clean)
+        # Between them the two runs recorded every attachment, as one run
+        # does. Files copied after the last batch was written are found on
+        # disk instead.
+        resumed_outcomes = outcomes(out)
+        resumed_outcomes['copied'] += resumed_outcomes.pop('exists', 0)
+        self.assertEqual(resumed_outcomes, outcomes(clean))
+        self.assertFalse([p for p in out.rglob('*.partial')])
+
+    def test_dedup_with_several_workers(self):
+        serial = self.extract(self.tmp / "serial", workers=1)
+        parallel = self.extract(self.tmp / "parallel", workers=8)
+        self.assertGreater(parallel.deduplicated, 0)
+        self.assertEqual((parallel.successful_copies, parallel.deduplicated),
+                         (serial.successful_copies, serial.deduplicated))
+
+        # Every content is stored once, whichever worker got to it first
+        files = extracted(self.tmp / "parallel")
+        self.assertEqual(len(files), parallel.successful_copies)
+        self.assertEqual(len(set(files.values())), len(files))
+        self.assertEqual(set(files.values()), set(extracted(self.tmp / "serial").values()))
+
+    def test_filters(self):
+        db = sqlite3.connect(str(self.library / "chat.db"))
+        names = [name for name, in db.execute("SELECT transfer_name FROM attachment "
+                                              "WHERE mime_type = 'application/pdf'")]
+        db.close()
+        expected = [name for name in names if fnmatch.fnmatchcase(name.lower(), "document 1*.pdf")]
+
+        out = self.tmp / "out"
+        filtered = self.extract(out, filters=PDFFilter(name="Document 1*.pdf"))
+        self.assertEqual(filtered.total_found, len(expected))
+        self.assertTrue(all(Path(path).name.startswith("Document 1") for path in extracted(out)))
+        self.assertEqual(self.summary(out)['filters'], {'name': "Document 1*.pdf"})
+
+        # A filtered run doesn't move the incremental position
+        rest = self.extract(out)
+        self.assertEqual(rest.total_found, self.counts['pdfs'])
+        clean = self.tmp / "clean"
+        self.extract(clean)
+        self.assertSameContent(out, clean)
+
+    def test_summary_json(self):
+        out = self.tmp / "out"
+        extractor = self.extract(out)
+        summary = self.summary(out)
+        self.assertEqual(summary['total_pdfs_found'], self.counts['pdfs'])
+        self.assertEqual(summary['successfully_copied'], extractor.successful_copies)
+        self.assertEqual(summary['deduplicated'], extractor.deduplicated)
+        self.assertEqual(summary['filters'], {})
+        self.assertIn('stages', summary['timings'])
+
+        skipped = summary['skipped_by_reason']
+        self.assertEqual(skipped.get('missing', 0), self.counts['missing'])
+        self.assertEqual(skipped.get('not_downloaded', 0), self.counts['offloaded'])
+        self.assertEqual(skipped.get('truncated', 0) + skipped.get('invalid', 0), self.counts['corrupt'])
+        self.assertEqual(len(summary['skipped_files']), sum(skipped.values()))
+        self.assertEqual(summary['total_pdfs_found'],
+                         summary['successfully_copied'] + summary['deduplicated'] + sum(skipped.values()))
+        for entry in summary['skipped_files']:
+            self.assertIn(entry['reason'], ("File not found", "Not downloaded (stored in iCloud)",
+                                            "Incomplete download", "Invalid PDF"))
+
+
+if __name__ == "__main__":
+    unittest.main()
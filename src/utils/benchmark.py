@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of analysis and extraction on a Messages library.
+
+Each stage runs in its own process so its peak RSS can be measured:
+``get_pdf_list``, ``extract_pdfs`` on the core extractor, and the CLI
+with --no-dry-run. Without --library-root a synthetic library is built
+first with make_fixture.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+
+STAGES = ('list', 'extract', 'cli')
+
+
+def _rss_mb(rusage) -> float:
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _dir_stats(path: Path):
+    files, size = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            if name.lower().endswith('.pdf'):
+                files += 1
+                size += os.path.getsize(os.path.join(root, name))
+    return files, size
+
+
+def run_stage(stage: str, library_root: str, output_dir: str, workers: int, copy_mode: str) -> Dict[str, Any]:
+    """Run one in-process stage; called in the child process."""
+    from core.pdf_extractor import IMessagePDFExtractor
+
+    extractor = IMessagePDFExtractor(output_dir=output_dir, library_root=library_root, workers=workers,
+                                     copy_mode=copy_mode)
+    try:
+        start = time.perf_counter()
+        if stage == 'list':
+            pdfs = extractor.get_pdf_list()
+            elapsed = time.perf_counter() - start
+            return {"elapsed": elapsed, "files": len(pdfs),
+                    "bytes": sum(pdf['size'] or 0 for pdf in pdfs if pdf['exists'])}
+        extractor.extract_pdfs(full=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        extractor.close()
+    files, size = _dir_stats(Path(output_dir))
+    return {"elapsed": elapsed, "files": files, "bytes": size}
+
+
+def _measure(command: List[str]) -> Dict[str, Any]:
+    """Run a command in a child process and collect its wall time and peak RSS."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=SRC_DIR)
+    stdout = proc.stdout.read()
+    proc.stdout.close()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {proc.returncode}")
+    return {"wall": wall, "rss_mb": _rss_mb(rusage), "stdout": stdout}
+
+
+def benchmark(library_root: Path, work_dir: Path, stages=STAGES, workers: int = 0,
+              copy_mode: str = 'copy') -> List[Dict[str, Any]]:
+    """Run the stages against a library and return one result per stage."""
+    results = []
+    for stage in stages:
+        output_dir = work_dir / f"out_{stage}"
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+        if stage == 'cli':
+            command = [sys.executable, str(SRC_DIR / "core/imessage_pdf_extract.py"), '--no-dry-run',
+                       '--full', '--library-root', str(library_root), '--output-dir', str(output_dir),
+                       '--copy-mode', copy_mode]
+            if workers:
+                command += ['--workers', str(workers)]
+            measured = _measure(command)
+            files, size = _dir_stats(output_dir)
+            result = {"elapsed": measured["wall"], "files": files, "bytes": size}
+        else:
+            command = [sys.executable, __file__, '--run-stage', stage, '--library-root', str(library_root),
+                       '--output-dir', str(output_dir), '--workers', str(workers), '--copy-mode', copy_mode]
+            measured = _measure(command)
+            result = json.loads(measured["stdout"].decode().strip().splitlines()[-1])
+
+        elapsed = result["elapsed"]
+        results.append({
+            "stage": stage,
+            "seconds": round(elapsed, 3),
+            "files": result["files"],
+            "files_per_s": round(result["files"] / elapsed, 1) if elapsed else None,
+            "mb_per_s": round(result["bytes"] / (1024 * 1024) / elapsed, 1) if elapsed else None,
+            "peak_rss_mb": round(measured["rss_mb"], 1)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PDF analysis and extraction')
+    parser.add_argument('--library-root', help='Existing Messages folder to benchmark against')
+    parser.add_argument('--attachments', type=int, default=10000,
+                        help='Size of the synthetic library when no --library-root is given')
+    parser.add_argument('--pdf-ratio', type=float, default=0.3)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1)
+    parser.add_argument('--missing', type=int, default=0)
+    parser.add_argument('--corrupt', type=int, default=0)
+    parser.add_argument('--pdf-size', type=int, default=64 * 1024)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--workers', type=int, default=0, help='Copy workers (default: the extractor default)')
+    parser.add_argument('--copy-mode', default='copy')
+    parser.add_argument('--work-dir', help='Where to put the library and outputs (default: a temp dir)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('--run-stage', choices=('list', 'extract'), help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        from core.parallel import DEFAULT_WORKERS
+        result = run_stage(args.run_stage, args.library_root, args.output_dir,
+                           args.workers or DEFAULT_WORKERS, args.copy_mode)
+        print(json.dumps(result))
+        return 0
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="pdf_benchmark_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        library_root = Path(args.library_root) if args.library_root else None
+        if library_root is None:
+            from utils.make_fixture import build_library
+            library_root = work_dir / "Messages"
+            start = time.perf_counter()
+            counts = build_library(library_root, attachments=args.attachments, pdf_ratio=args.pdf_ratio,
+                                   duplicate_ratio=args.duplicate_ratio, missing=args.missing,
+                                   corrupt=args.corrupt, pdf_size=args.pdf_size)
+            print(f"Built library with {counts['pdfs']} PDFs in {time.perf_counter() - start:.1f}s",
+                  file=sys.stderr)
+
+        results = benchmark(library_root, work_dir, args.stages, args.workers, args.copy_mode)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'stage':<10}{'seconds':>10}{'files':>8}{'files/s':>10}{'MB/s':>8}{'peak RSS MB':>13}")
+        for r in results:
+            print(f"{r['stage']:<10}{r['seconds']:>10}{r['files']:>8}{r['files_per_s']:>10}"
+                  f"{r['mb_per_s']:>8}{r['peak_rss_mb']:>13}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Build a synthetic Messages library for testing and benchmarks.
+
+Writes a chat.db with the tables and columns the extractors read, laid out
+like the one on macOS, and a matching Attachments/xx/yy/GUID/ tree. Point
+the extractors at it with --library-root.
+"""
+import sys
+import random
+import sqlite3
+import argparse
+import uuid
+from pathlib import Path
+from typing import Dict
+
+# Seconds between the Unix epoch and Apple's, 2001-01-01
+APPLE_EPOCH_OFFSET = 978307200
+
+# Rows inserted per executemany call
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE handle (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+    id TEXT NOT NULL,
+    country TEXT,
+    service TEXT NOT NULL,
+    uncanonicalized_id TEXT,
+    person_centric_id TEXT
+);
+CREATE TABLE chat (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    style INTEGER,
+    state INTEGER,
+    account_id TEXT,
+    chat_identifier TEXT,
+    service_name TEXT,
+    display_name TEXT
+);
+CREATE TABLE message (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    text TEXT,
+    handle_id INTEGER DEFAULT 0,
+    service TEXT,
+    date INTEGER,
+    date_read INTEGER,
+    date_delivered INTEGER,
+    is_from_me INTEGER DEFAULT 0,
+    cache_has_attachments INTEGER DEFAULT 0
+);
+CREATE TABLE attachment (
+    ROWID INTEGER PRIMARY KEY AUTOINCREMENT,
+    guid TEXT UNIQUE NOT NULL,
+    created_date INTEGER DEFAULT 0,
+    start_date INTEGER DEFAULT 0,
+    filename TEXT,
+    uti TEXT,
+    mime_type TEXT,
+    transfer_state INTEGER DEFAULT 0,
+    is_outgoing INTEGER DEFAULT 0,
+    user_info BLOB,
+    transfer_name TEXT,
+    total_bytes INTEGER DEFAULT 0,
+    is_sticker INTEGER DEFAULT 0,
+    hide_attachment INTEGER DEFAULT 0
+);
+CREATE TABLE chat_handle_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    handle_id INTEGER REFERENCES handle (ROWID) ON DELETE CASCADE,
+    UNIQUE(chat_id, handle_id)
+);
+CREATE TABLE chat_message_join (
+    chat_id INTEGER REFERENCES chat (ROWID) ON DELETE CASCADE,
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    message_date INTEGER DEFAULT 0,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE TABLE message_attachment_join (
+    message_id INTEGER REFERENCES message (ROWID) ON DELETE CASCADE,
+    attachment_id INTEGER REFERENCES attachment (ROWID) ON DELETE CASCADE,
+    UNIQUE(message_id, attachment_id)
+);
+CREATE INDEX message_idx_handle ON message(handle_id, date);
+CREATE INDEX message_idx_date ON message(date);
+CREATE INDEX message_attachment_join_idx_message_id ON message_attachment_join(message_id);
+CREATE INDEX message_attachment_join_idx_attachment_id ON message_attachment_join(attachment_id);
+CREATE INDEX chat_message_join_idx_message_id_only ON chat_message_join(message_id);
+CREATE INDEX chat_message_join_idx_message_date_id_chat_id ON chat_message_join(chat_id, message_date, message_id);
+"""
+
+
+def apple_time(unix_seconds: float) -> int:
+    """Convert a Unix timestamp to chat.db's nanoseconds since 2001."""
+    return int((unix_seconds - APPLE_EPOCH_OFFSET) * 1e9)
+
+
+def pdf_body(rng: random.Random, size: int) -> bytes:
+    """Make a PDF-shaped file: header, filler and a trailer the validators accept."""
+    header = b"%PDF-1.4\n"
+    trailer = b"\nstartxref\n0\n%%EOF\n"
+    return header + rng.randbytes(max(0, size - len(header) - len(trailer))) + trailer
+
+
+def build_library(root: Path, attachments: int = 1000, pdf_ratio: float = 0.3, duplicate_ratio: float = 0.1,
+                  missing: int = 0, corrupt: int = 0, offloaded: int = 0, pdf_size: int = 64 * 1024,
+                  senders: int = 50, seed: int = 0) -> Dict[str, int]:
+    """Create chat.db and Attachments under root; returns counts of what was made."""
+    rng = random.Random(seed)
+    root = Path(root)
+    db_path = root / "chat.db"
+    root.mkdir(parents=True, exist_ok=True)
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.executescript(SCHEMA)
+
+    conn.executemany(
+        "INSERT INTO handle (id, country, service, uncanonicalized_id) VALUES (?, 'us', 'iMessage', ?)",
+        [(f"+1555{i:07d}", f"555{i:07d}") for i in range(1, senders + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO chat (guid, style, state, account_id, chat_identifier, service_name) "
+        "VALUES (?, 45, 3, 'e:', ?, 'iMessage')",
+        [(f"iMessage;-;+1555{i:07d}", f"+1555{i:07d}") for i in range(1, senders + 1)]
+    )
+    conn.executemany("INSERT INTO chat_handle_join VALUES (?, ?)", [(i, i) for i in range(1, senders + 1)])
+
+    # Pick which PDFs get which defect up front so the counts are exact
+    pdf_count = int(attachments * pdf_ratio)
+    pdf_rows = set(rng.sample(range(1, attachments + 1), pdf_count))
+    defective = rng.sample(sorted(pdf_rows), min(pdf_count, missing + corrupt + offloaded))
+    missing_rows = set(defective[:missing])
+    corrupt_rows = set(defective[missing:missing + corrupt])
+    # Only in iCloud: never downloaded, so no file and an unfinished transfer state
+    offloaded_rows = set(defective[missing + corrupt:])
+
+    now = 1_700_000_000
+    span = 5 * 365 * 86400
+    stored = []
+    counts = {"attachments": attachments, "pdfs": pdf_count, "duplicates": 0,
+              "missing": len(missing_rows), "corrupt": len(corrupt_rows), "offloaded": len(offloaded_rows),
+              "bytes": 0}
+
+    messages, attachment_rows, joins, chat_joins = [], [], [], []
+
+    def flush():
+        conn.executemany("INSERT INTO message VALUES (?, ?, NULL, ?, 'iMessage', ?, ?, ?, ?, 1)", messages)
+        conn.executemany("INSERT INTO attachment VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NULL, ?, ?, 0, 0)",
+                         attachment_rows)
+        conn.executemany("INSERT INTO message_attachment_join VALUES (?, ?)", joins)
+        conn.executemany("INSERT INTO chat_message_join VALUES (?, ?, ?)", chat_joins)
+        for rows in (messages, attachment_rows, joins, chat_joins):
+            rows.clear()
+
+    for rowid in range(1, attachments + 1):
+        guid = str(uuid.UUID(int=rng.getrandbits(128), version=4)).upper()
+        date = apple_time(now - span + span * rowid / attachments + rng.random())
+        sender = rng.randint(1, senders)
+        is_from_me = int(rng.random() < 0.3)
+
+        if rowid in pdf_rows:
+            name, uti, mime = f"Document {rowid}.pdf", "com.adobe.pdf", "application/pdf"
+            if stored and rng.random() < duplicate_ratio:
+                body = rng.choice(stored)
+                counts["duplicates"] += 1
+            else:
+                body = pdf_body(rng, max(256, int(rng.expovariate(1 / pdf_size))))
+                stored.append(body)
+                if len(stored) > 100:
+                    stored.pop(0)
+            # chat.db keeps the size of the whole file, even if less arrived
+            total_bytes = len(body)
+            if rowid in corrupt_rows:
+                # Alternate between a bad header and a truncated download
+                body = b"<html>" + body[6:] if rowid % 2 else body[:len(body) // 2]
+        else:
+            name, uti, mime = f"IMG_{rowid:04d}.jpeg", "public.jpeg", "image/jpeg"
+            body = b"\xff\xd8\xff\xe0" + rng.randbytes(rng.randint(100, 2000))
+            total_bytes = len(body)
+
+        rel = f"Attachments/{guid[-2:].lower()}/{rowid % 100:02d}/{guid}/{name}"
+        if rowid not in missing_rows and rowid not in offloaded_rows:
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(body)
+            counts["bytes"] += len(body)
+
+        messages.append((rowid, f"msg-{guid}", sender, date, date, date, is_from_me))
+        transfer_state = 0 if rowid in offloaded_rows else 5
+        attachment_rows.append((rowid, guid, date, date, f"~/Library/Messages/{rel}", uti, mime,
+                                transfer_state, is_from_me, name, total_bytes))
+        joins.append((rowid, rowid))
+        chat_joins.append((sender, rowid, date))
+        if len(messages) >= BATCH_SIZE:
+            flush()
+
+    flush()
+    conn.commit()
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Messages library (chat.db and Attachments)')
+    parser.add_argument('root', help='Directory to create; pass it to the extractors as --library-root')
+    parser.add_argument('--attachments', type=int, default=1000, help='Total attachments (default: 1000)')
+    parser.add_argument('--pdf-ratio', type=float, default=0.3, help='Share of attachments that are PDFs')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1,
+                        help='Share of PDFs that repeat the content of an earlier one')
+    parser.add_argument('--missing', type=int, default=0, help='PDFs listed in chat.db but absent on disk')
+    parser.add_argument('--corrupt', type=int, default=0, help='PDFs with a bad header or truncated body')
+    parser.add_argument('--offloaded', type=int, default=0,
+                        help='PDFs stored only in iCloud: not downloaded, with no file on disk')
+    parser.add_argument('--pdf-size', type=int, default=64 * 1024, help='Mean PDF size in bytes')
+    parser.add_argument('--senders', type=int, default=50, help='Number of handles and chats')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same library')
+    args = parser.parse_args()
+
+    counts = build_library(Path(args.root), attachments=args.attachments, pdf_ratio=args.pdf_ratio,
+                           duplicate_ratio=args.duplicate_ratio, missing=args.missing, corrupt=args.corrupt,
+                           offloaded=args.offloaded, pdf_size=args.pdf_size, senders=args.senders, seed=args.seed)
+    print(f"Created {args.root}: " + ", ".join(f"{value} {name}" for name, value in counts.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())